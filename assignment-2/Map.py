@@ -1,9 +1,72 @@
+import os
 import numpy as np
 np.set_printoptions(threshold=np.inf, linewidth=300)
-import pandas as pd
 import time
+import weakref
 from PIL import Image
 
+# Directory holding the map files
+MAP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Human readable symbols for the cell values -1 through 4
+CELL_SYMBOLS = np.array(['#', '0', '.', ',', ':', ';'], dtype='<U21')
+
+# Number of changes made in place to each map array, by array identity, so
+# data precomputed from a map can tell whether it is still current
+_map_versions = {}
+
+
+def map_version(int_map):
+    """
+    Returns how often the given map array was changed in place, 0 if never.
+    :param int_map: map array
+    :return: the version of the map array
+    """
+    entry = _map_versions.get(id(int_map))
+    if entry is not None and entry[0]() is int_map:
+        return entry[1]
+    return 0
+
+
+def mark_map_changed(int_map):
+    """
+    Records a change made in place to the given map array, which Map_Obj does for every cell it changes. Code which
+    writes to a map array directly after searching it calls this itself.
+    :param int_map: map array which was changed
+    :return: nothing.
+    """
+    array_id = id(int_map)
+    entry = _map_versions.get(array_id)
+    if entry is None or entry[0]() is not int_map:
+        entry = (weakref.ref(int_map, lambda _: _map_versions.pop(array_id, None)), 0)
+    _map_versions[array_id] = (entry[0], entry[1] + 1)
+
+
+def load_int_map(path):
+    """
+    Loads the integer map stored in the given .csv file, relative to MAP_DIR unless absolute. The parsed map is
+    cached in a .npy file next to it, which later loads are memory mapped from as long as it is newer than the .csv.
+    The mapping is copy-on-write, so changes to the returned array never reach the cache.
+    :param path: Path to .csv map
+    :return: the integer map
+    """
+    path = os.path.join(MAP_DIR, path)
+    cache_path = os.path.splitext(path)[0] + '.npy'
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        return np.asarray(np.load(cache_path, mmap_mode='c'))
+
+    data = np.loadtxt(path, delimiter=',', dtype=np.int64, ndmin=2)
+    try:
+        # Write to a temporary file first, so concurrent readers never see a partial cache
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return data
+
+
 class Map_Obj():
     # Map format
     START_CELL = 'S'
@@ -18,6 +81,8 @@ class Map_Obj():
         self.set_cell_value(self.start_pos, 'S')
         self.set_cell_value(self.goal_pos, 'G')
         self.tick_counter = 0
+        self.goal_listeners = []
+        self.cell_listeners = []
         self.set_start_pos_str_marker(self.start_pos, self.str_map)
         self.set_goal_pos_str_marker(self.goal_pos, self.str_map)
 
@@ -29,17 +94,12 @@ class Map_Obj():
         :return: the integer map and string map
         """
         # Read map from provided csv file
-        df = pd.read_csv("assignment-2\\" + path, index_col=None, header=None)#,error_bad_lines=False)
-        # Convert pandas dataframe to numpy array
-        data = df.values
-        # Convert numpy array to string to make it more human readable
-        data_str = data.astype(str)
-        # Replace numeric values with more human readable symbols
-        data_str[data_str == '-1'] = '#'
-        data_str[data_str == '1'] = '.'
-        data_str[data_str == '2'] = ','
-        data_str[data_str == '3'] = ':'
-        data_str[data_str == '4'] = ';'
+        data = load_int_map(path)
+        # Convert numpy array to strings, using more human readable symbols where defined
+        known = (data >= -1) & (data <= 4)
+        data_str = CELL_SYMBOLS[np.where(known, data + 1, 0)]
+        if not known.all():
+            data_str[~known] = data[~known].astype(str)
         return data, data_str
 
     def fill_critical_positions(self, task):
@@ -106,6 +166,31 @@ class Map_Obj():
         self.tmp_cell_value = self.get_cell_value(pos)
         self.goal_pos = [pos[0], pos[1]]
         self.replace_map_values(tmp_pos, tmp_val, self.goal_pos)
+        for listener in self.goal_listeners:
+            listener(tmp_pos, self.goal_pos)
+
+    def add_goal_listener(self, listener):
+        """
+        Registers a function to be called whenever the goal moves, such as search data kept up to date with the goal.
+        :param listener: function of the form (old goal position, new goal position) -> None
+        :return: nothing.
+        """
+        self.goal_listeners.append(listener)
+
+    def remove_goal_listener(self, listener):
+        self.goal_listeners.remove(listener)
+
+    def add_cell_listener(self, listener):
+        """
+        Registers a function to be called whenever the value of a cell in the int map changes, such as search data
+        repaired for the new cell costs.
+        :param listener: function of the form (position, old value, new value) -> None
+        :return: nothing.
+        """
+        self.cell_listeners.append(listener)
+
+    def remove_cell_listener(self, listener):
+        self.cell_listeners.remove(listener)
 
     def set_cell_value(self, pos, value, str_map = True):
         if str_map:
@@ -113,7 +198,18 @@ class Map_Obj():
                 return
             self.str_map[pos[0], pos[1]] = value
         else:
+            old_value = self.int_map[pos[0], pos[1]]
             self.int_map[pos[0], pos[1]] = value
+            self.notify_cell_changed(pos, old_value, value)
+
+    def notify_cell_changed(self, pos, old_value, value):
+        """
+        Marks the map as changed and calls the cell listeners if the value of the cell at pos changed.
+        """
+        if old_value != value:
+            mark_map_changed(self.int_map)
+            for listener in self.cell_listeners:
+                listener((pos[0], pos[1]), old_value, value)
 
     def print_map(self, map_to_print):
         # For every column in provided map, print it
@@ -153,8 +249,10 @@ class Map_Obj():
             str_value = ';'
         else:
             str_value = str(value)
+        old_value = self.int_map[pos[0]][pos[1]]
         self.int_map[pos[0]][pos[1]] = value
         self.str_map[pos[0]][pos[1]] = str_value
+        self.notify_cell_changed(pos, old_value, value)
         self.str_map[goal_pos[0], goal_pos[1]] = 'G'
 
 
@@ -199,11 +297,12 @@ class Map_Obj():
         else:
             map[goal_pos[0]][goal_pos[1]] = 'G'
 
-    def show_map(self, map=None):
+    def render_map(self, map=None, scale=20):
         """
-        A function used to draw the map as an image and show it.
+        A function used to draw the map as an image.
         :param map: map to use
-        :return: nothing.
+        :param scale: width and height in pixels of every cell
+        :return: the image.
         """
         # If a map is provided, set the goal and start positions
         if map is not None:
@@ -213,32 +312,33 @@ class Map_Obj():
         else:
             map = self.str_map
 
-        # Define width and height of image
-        width = map.shape[1]
-        height = map.shape[0]
-        # Define scale of the image
-        scale = 20
-        # Create an all-yellow image
-        image = Image.new('RGB', (width * scale, height * scale), (255, 255, 0))
-        # Load image
-        pixels = image.load()
-
         # Define what colors to give to different values of the string map (undefined values will remain yellow, this is
         # how the yellow path is painted)
         colors = {'#': (255, 0, 0), '.': (215, 215, 215), ',': (166, 166, 166), ':': (96, 96, 96),
                   ';': (36, 36, 36), 'S': (255, 0, 255), 'G': (0, 128, 255)}
-        # Go through image and set pixel color for every position
-        for y in range(height):
-            for x in range(width):
-                if map[y][x] not in colors: continue
-                for i in range(scale):
-                    for j in range(scale):
-                        pixels[x * scale + i, y * scale + j] = colors[map[y][x]]
-        
-        # # Saves solution to file
-        # image.save("solution.png","PNG")
-
-        # Show image
-        image.show()
+        # Look up the color of every distinct symbol once, and index the lookup table with the whole map
+        symbols, inverse = np.unique(np.asarray(map), return_inverse=True)
+        lookup = np.array([colors.get(symbol, (255, 255, 0)) for symbol in symbols], dtype=np.uint8)
+        pixels = lookup[inverse.reshape(map.shape)]
+        # Scale every cell up to a block of scale x scale pixels
+        pixels = np.repeat(np.repeat(pixels, scale, axis=0), scale, axis=1)
+        return Image.fromarray(pixels, 'RGB')
 
+    def save_map(self, path, map=None, scale=20):
+        """
+        A function used to draw the map as an image and save it as PNG, without showing it.
+        :param path: file to write
+        :param map: map to use
+        :param scale: width and height in pixels of every cell
+        :return: nothing.
+        """
+        self.render_map(map, scale).save(path, 'PNG')
 
+    def show_map(self, map=None):
+        """
+        A function used to draw the map as an image and show it.
+        :param map: map to use
+        :return: nothing.
+        """
+        # Show image
+        self.render_map(map).show()
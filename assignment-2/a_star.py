@@ -1,4 +1,7 @@
-from min_heap import MinHeap
+import heapq
+import itertools
+
+from min_heap import IndexedMinHeap
 from Map import Map_Obj
 
 
@@ -40,28 +43,38 @@ def initialize_successor_node(parent, successor_state, heuristic_func, cost_func
     return successor
 
 def create_path_to(node):
-    # Base case
-    if node.parent is None:
-        return [node]
-
-    return create_path_to(node.parent) + [node]
+    # Count the nodes first, then fill the path from the end
+    length = 0
+    current = node
+    while current is not None:
+        length += 1
+        current = current.parent
+
+    path = [None] * length
+    for i in range(length - 1, -1, -1):
+        path[i] = node
+        node = node.parent
+    return path
 
 def attach_and_eval(successor, parent, heuristic_func, cost_func):
     successor.parent = parent
-    successor.g = parent.g + cost_func(successor.state, parent.state)
+    successor.g = parent.g + cost_func(parent.state, successor.state)
     successor.h = heuristic_func(successor.state)
     successor.f = successor.g + successor.h
 
-def propagate_path_improvements(parent, heuristic_func, cost_func):
+def propagate_path_improvements(parent, heuristic_func, cost_func, stats=None):
     for successor in parent.successors:
         new_cost = parent.g + cost_func(parent.state, successor.state)
         if new_cost < successor.g:
             successor.parent = parent
             successor.g = new_cost
             successor.f = successor.g 
+            if stats is not None:
+                stats.propagated += 1
 
 
-def a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=lambda *_: 1):
+def a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=lambda *_: 1,
+           queue_factory=IndexedMinHeap, stats=None):
     """
     Generalized implementation of A* search.
 
@@ -77,18 +90,28 @@ def a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_fun
         cost_func:          Function which returns the cost of a state transition:
                                 from_state, to_state -> cost
                             Defaults to a cost of one.
+        queue_factory:      Frontier constructor, called with key_attr='f'.
+                            Defaults to IndexedMinHeap, BucketQueue may be used
+                            when f-values are non-negative integers.
+        stats:              SearchStats instance which collects counters and
+                            timings of the search. Disabled by default.
     
     Returns:
         A list of the form 
             [(x0, y0), (x1, y1), ..., (xn, yn)] 
         representing a path from start to end node.
     """
+    if stats is not None:
+        heuristic_func, successors_gen, goal_predicate, queue_factory = stats.instrument(
+            heuristic_func, successors_gen, goal_predicate, queue_factory
+        )
+
     # Memoization table, maps from state to corresponding node
     memo = {}
 
     # Initialize containers
     closed = set()
-    open_ = MinHeap(key_attr='f')
+    open_ = queue_factory(key_attr='f')
 
     # Initialize starting node
     start = initialize_start_node(start_state, heuristic_func)
@@ -124,6 +147,89 @@ def a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_fun
             # If path is an improvement to previously discovered node
             elif u.g + cost_func(u.state, v.state) < v.g:
                 attach_and_eval(v, u, heuristic_func, cost_func)
+                # Restore heap order for the improved frontier node
+                if v in open_:
+                    open_.decrease_key_noderef(v, v.f)
                 # If successor is an internal node
-                if v in closed:
-                    propagate_path_improvements(v, heuristic_func, cost_func)
+                elif v in closed:
+                    if stats is not None:
+                        stats.reopened += 1
+                    propagate_path_improvements(v, heuristic_func, cost_func, stats)
+
+
+def lazy_a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=lambda *_: 1, stats=None):
+    """
+    A* search with lazy duplicate detection, an alternative to a_star for
+    large searches.
+
+    Nodes keep no lists of their successors. A state reached along a cheaper
+    path is pushed onto the frontier again, and entries whose g-value is no
+    longer the best known for their state are skipped when popped. A state
+    expanded earlier is thereby reopened and its successors improved as it
+    is expanded again, instead of walking the improvement through the
+    explored graph at once. With a consistent heuristic no state is ever
+    reopened.
+
+    Input:
+        start_state:        Initial state
+        heuristic_func:     Function of the form (state) -> heuristic value
+        successors_gen:     Generator which yields all successors for a given state:
+                                state -> yield successor state
+        goal_predicate:     Predicate to test whether the given state is a goal state:
+                                state -> True or False
+
+        (Optional)
+        cost_func:          Function which returns the cost of a state transition:
+                                from_state, to_state -> cost
+                            Defaults to a cost of one.
+        stats:              SearchStats instance which collects counters and
+                            timings of the search. Disabled by default.
+
+    Returns:
+        A list of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        representing a path from start to end node, or None if there is none.
+    """
+    if stats is not None:
+        heuristic_func, successors_gen, goal_predicate, _ = stats.instrument(
+            heuristic_func, successors_gen, goal_predicate, None
+        )
+
+    # Best known cost and parent per state. The counter breaks ties without
+    # comparing states.
+    g = {start_state: 0}
+    parent = {start_state: None}
+    counter = itertools.count()
+    # Expanded states, only needed to count reopenings
+    closed = set() if stats is not None else None
+    open_ = [(heuristic_func(start_state), next(counter), 0, start_state)]
+
+    while open_:
+        _, _, g_u, u = heapq.heappop(open_)
+        # Skip entries superseded by a cheaper path to their state
+        if g_u > g[u]:
+            continue
+        if stats is not None:
+            stats.queue_ops += 1
+            if u in closed:
+                stats.reopened += 1
+            closed.add(u)
+
+        if goal_predicate(u):
+            path = []
+            while u is not None:
+                path.append(u[1:])
+                u = parent[u]
+            path.reverse()
+            return path
+
+        for v in successors_gen(u):
+            g_v = g_u + cost_func(u, v)
+            if g_v < g.get(v, float('inf')):
+                g[v] = g_v
+                parent[v] = u
+                heapq.heappush(open_, (g_v + heuristic_func(v), next(counter), g_v, v))
+                if stats is not None:
+                    stats.queue_ops += 1
+                    stats.frontier_peak = max(stats.frontier_peak, len(open_))
+    return None
@@ -0,0 +1,183 @@
+import math
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from distance_field import map_key
+from grid_a_star import MOVES_8, neighbour_masks
+from lru import LRUCache
+from Map import Map_Obj
+
+
+class CSRGraph:
+    """
+    Compressed sparse row adjacency of a grid map. The neighbours of cell u
+    (by flat index) are neighbours[offsets[u]:offsets[u + 1]], and moving
+    to them costs the matching entries of costs.
+
+    Searches index the arrays through memoryviews, which return plain Python
+    numbers and are considerably faster to index element by element than
+    numpy arrays.
+    """
+    ARRAYS = ('offsets', 'neighbours', 'costs')
+
+    def __init__(self, shape, offsets, neighbours, costs):
+        self.shape = tuple(shape)
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.costs = costs
+        self._blocks = {}
+
+    @classmethod
+    def build(cls, int_map, connectivity=4, corner_cutting='never'):
+        '''
+        Compiles the adjacency of the given map, with the movement rules of
+        grid_a_star.
+        '''
+        width = int_map.shape[1]
+        masks = neighbour_masks(int_map, connectivity, corner_cutting).ravel()
+        cell_costs = int_map.ravel().astype(np.float64)
+
+        sources, targets, costs = [], [], []
+        for bit, (dx, dy) in enumerate(MOVES_8[:connectivity]):
+            u = np.flatnonzero(masks >> bit & 1)
+            v = u + dx * width + dy
+            sources.append(u)
+            targets.append(v)
+            costs.append(cell_costs[v] * (math.sqrt(2) if dx and dy else 1))
+
+        # Group the edges by source cell, keeping the MOVES_8 order within a cell
+        sources = np.concatenate(sources)
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(masks.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=masks.size), out=offsets[1:])
+        neighbours = np.concatenate(targets)[order].astype(np.int32 if masks.size < 2**31 else np.int64)
+        return cls(int_map.shape, offsets, neighbours, np.concatenate(costs)[order])
+
+    def views(self):
+        '''
+        Returns (offsets, neighbours, costs) as memoryviews for searches.
+        '''
+        return tuple(memoryview(getattr(self, name)) for name in self.ARRAYS)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def share(self):
+        '''
+        Returns a copy of the graph backed by shared memory. Its handle can be
+        pickled to other processes, which attach to the same memory with
+        CSRGraph.attach(handle). The caller must unlink() the copy when done.
+        '''
+        graph = CSRGraph(self.shape, None, None, None)
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[:] = array
+            setattr(graph, name, shared)
+            graph._blocks[name] = block
+        return graph
+
+    @property
+    def handle(self):
+        '''
+        Picklable description of the shared memory behind the graph.
+        '''
+        if not self._blocks:
+            raise ValueError('The graph is not in shared memory, see CSRGraph.share().')
+        return self.shape, {
+            name: (self._blocks[name].name, getattr(self, name).shape, getattr(self, name).dtype.str)
+            for name in self.ARRAYS
+        }
+
+    @classmethod
+    def attach(cls, handle):
+        '''
+        Attaches to a graph shared by another process.
+        '''
+        shape, arrays = handle
+        graph = cls(shape, None, None, None)
+        for name, (block_name, array_shape, dtype) in arrays.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            setattr(graph, name, np.ndarray(array_shape, dtype=dtype, buffer=block.buf))
+            graph._blocks[name] = block
+        return graph
+
+    def close(self):
+        '''
+        Detaches from the shared memory, after which the graph is unusable.
+        '''
+        for name in self.ARRAYS:
+            setattr(self, name, None)
+        for block in self._blocks.values():
+            block.close()
+
+    def unlink(self):
+        '''
+        Detaches from and frees the shared memory, called by its creator.
+        '''
+        blocks = list(self._blocks.values())
+        self.close()
+        for block in blocks:
+            block.unlink()
+        self._blocks.clear()
+
+
+class GraphCache(LRUCache):
+    """
+    Cache of compiled graphs, keyed by map content and movement rules.
+    """
+    def __init__(self, max_bytes=256 * 2**20):
+        super().__init__(max_bytes)
+
+    def get(self, int_map, connectivity=4, corner_cutting='never', key=None):
+        '''
+        Returns the compiled graph of the given map. key identifies the map
+        content, by default its hash as given by map_key.
+        '''
+        key = (key if key is not None else map_key(int_map), connectivity, corner_cutting)
+        return self.lookup(key, lambda: CSRGraph.build(int_map, connectivity, corner_cutting))
+
+
+# Graphs compiled by compile_map for callers without a cache of their own
+default_cache = GraphCache()
+
+
+def compile_map(int_map, connectivity=4, corner_cutting='never', cache=default_cache, key=None):
+    '''
+    Returns the (possibly cached) compiled adjacency of the given map.
+    '''
+    return cache.get(int_map, connectivity, corner_cutting, key)
+
+
+def main():
+    '''
+    Checks that cached graphs follow changes made to a map in place: walls
+    off the cheapest route of task 1 cell by cell until the goal is cut off,
+    comparing searches on the cached graph to searches on the map itself.
+    '''
+    # Imported here, since grid_a_star is only needed for the check
+    from grid_a_star import grid_a_star, path_cost
+
+    map_obj = Map_Obj(task=1)
+    int_map = map_obj.int_map
+    start, goal = tuple(map_obj.get_start_pos()), tuple(map_obj.get_goal_pos())
+    print(f"{'walled off':>10} {'cost':>6}")
+    pos = None
+    while True:
+        graph = compile_map(int_map)
+        expected = grid_a_star(int_map, start, goal)
+        cost = path_cost(int_map, grid_a_star(int_map, start, goal, graph=graph))
+        if cost != path_cost(int_map, expected):
+            raise RuntimeError(f"Cached graph gives cost {cost} instead of {path_cost(int_map, expected)} "
+                               f"after walling off {pos}.")
+        print(f"{str(pos):>10} {cost!s:>6}")
+        if expected is None:
+            break
+        pos = expected[len(expected) // 2]
+        map_obj.set_cell_value(pos, Map_Obj.OBSTACLE_CELL, str_map=False)
+
+if __name__ == "__main__":
+    main()
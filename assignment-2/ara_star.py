@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import time
+
+from Map import Map_Obj
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+
+
+def ara_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=lambda *_: 1,
+             weight=3.0, weight_step=0.5, deadline=None):
+    """
+    Anytime Repairing A* (ARA*). Runs weighted A* with a decreasing heuristic
+    weight, reusing the search tree of the previous iteration, and reports
+    every improved path found along the way.
+
+    Input:
+        start_state:        Initial state
+        heuristic_func:     Function of the form (state) -> heuristic value
+        successors_gen:     Generator which yields all successors for a given state:
+                                state -> yield successor state
+        goal_predicate:     Predicate to test whether the given state is a goal state:
+                                state -> True or False
+
+        (Optional)
+        cost_func:          Function which returns the cost of a state transition:
+                                from_state, to_state -> cost
+                            Defaults to a cost of one.
+        weight:             Initial heuristic weight, at least 1
+        weight_step:        Amount the weight is lowered by after every path
+        deadline:           time.perf_counter() value at which the search stops,
+                            after which no further paths are yielded
+
+    Returns:
+        Generator which yields a tuple
+            (path, cost, weight, bound)
+        after every iteration which found a cheaper path, where path is of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        and its cost is at most bound times the optimal cost. An iteration
+        which only tightens the bound of the last path yields None as path.
+        The generator stops once the path is proven optimal (bound == 1), at
+        the deadline, or right away if there is no path.
+    """
+    if weight < 1:
+        raise ValueError('The heuristic weight must be at least 1.')
+
+    g = {start_state: 0}
+    h = {start_state: heuristic_func(start_state)}
+    parent = {start_state: None}
+    goal = start_state if goal_predicate(start_state) else None
+
+    # Frontier as a heap with lazy deletion, keys holds the current key of
+    # every open state. The counter breaks ties without comparing states.
+    keys = {}
+    open_ = []
+    counter = itertools.count()
+    closed = set()
+    # Closed states whose cost improved during the current iteration
+    incons = set()
+
+    def push(state):
+        keys[state] = g[state] + weight * h[state]
+        heapq.heappush(open_, (keys[state], next(counter), state))
+
+    push(start_state)
+    reported_cost = float('inf')
+    reported_bound = float('inf')
+
+    while True:
+        # Expand states until no open state can improve the current path
+        while open_:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            key, _, u = open_[0]
+            if keys.get(u) != key:
+                heapq.heappop(open_)
+                continue
+            if goal is not None and g[goal] <= key:
+                break
+            heapq.heappop(open_)
+            del keys[u]
+            closed.add(u)
+
+            for v in successors_gen(u):
+                g_v = g[u] + cost_func(u, v)
+                if g_v < g.get(v, float('inf')):
+                    g[v] = g_v
+                    parent[v] = u
+                    if v not in h:
+                        h[v] = heuristic_func(v)
+                    if goal_predicate(v) and (goal is None or g_v <= g[goal]):
+                        goal = v
+                    if v in closed:
+                        incons.add(v)
+                    else:
+                        push(v)
+
+        if goal is None:
+            return
+
+        # The optimal cost is at least the lowest unweighted f-value of any
+        # state which may still lead to a cheaper path
+        lower_bound = min(
+            (g[s] + h[s] for s in itertools.chain(keys, incons)),
+            default=float('inf')
+        )
+        if lower_bound == float('inf'):
+            bound = 1.0
+        elif lower_bound > 0:
+            bound = max(1.0, min(weight, g[goal] / lower_bound))
+        else:
+            bound = weight
+
+        if g[goal] < reported_cost:
+            reported_cost, reported_bound = g[goal], bound
+            yield path_to(parent, goal), g[goal], weight, bound
+        elif bound < reported_bound:
+            reported_bound = bound
+            yield None, g[goal], weight, bound
+
+        if bound <= 1:
+            return
+
+        # Lower the weight and continue from the open and inconsistent states
+        weight = max(1.0, weight - weight_step)
+        states = set(keys) | incons
+        keys.clear()
+        open_.clear()
+        closed.clear()
+        incons.clear()
+        for state in states:
+            push(state)
+
+def path_to(parent, state):
+    '''
+    Follows the parent links from the given state back to the start.
+    '''
+    path = []
+    while state is not None:
+        path.append(state[1:])
+        state = parent[state]
+    path.reverse()
+    return path
+
+def anytime_a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=lambda *_: 1,
+                   time_budget=0.05, **kwargs):
+    '''
+    Runs ARA* until the time budget (in seconds) is spent or the path is
+    proven optimal. Returns the last (path, cost, weight, bound) found, or
+    None if no path was found in time.
+    '''
+    deadline = time.perf_counter() + time_budget
+    best = None
+    for path, cost, weight, bound in ara_star(start_state, heuristic_func, successors_gen, goal_predicate,
+                                              cost_func=cost_func, deadline=deadline, **kwargs):
+        best = (path if path is not None else best[0], cost, weight, bound)
+    return best
+
+def main():
+    for task in range(1, 5):
+        map_obj = Map_Obj(task=task)
+        start_state = (map_obj, *map_obj.get_start_pos())
+        t = time.perf_counter()
+        print(f"Task {task}")
+        for path, cost, weight, bound in ara_star(start_state, manhattan, successors_gen, goal_predicate,
+                                                  cost_func=cost_func, weight=5.0, weight_step=1.0):
+            print(f"  {(time.perf_counter() - t) * 1000:7.2f} ms  weight {weight:.1f}  "
+                  f"cost {cost:>4}  bound {bound:.3f}{'' if path is not None else '  (bound only)'}")
+
+if __name__ == "__main__":
+    main()
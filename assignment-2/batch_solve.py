@@ -0,0 +1,113 @@
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from adjacency import CSRGraph, compile_map
+from grid_a_star import grid_a_star, path_cost
+from Map import Map_Obj, load_int_map
+
+SAMFUNDET_MAPS = ('Samfundet_map_1.csv', 'Samfundet_map_2.csv', 'Samfundet_map_Edgar_full.csv')
+
+# Maps and their compiled graphs in the current worker process, keyed by map file
+_worker_maps = {}
+_worker_graphs = {}
+
+
+def _init_worker(graph_handles):
+    '''
+    Loads every map once per worker. Maps come memory mapped from their .npy
+    cache and graphs from shared memory, so both are shared between workers.
+    '''
+    for map_path, handle in graph_handles.items():
+        _worker_maps[map_path] = load_int_map(map_path)
+        _worker_graphs[map_path] = CSRGraph.attach(handle)
+
+def _solve(query):
+    map_path, start, goal = query
+    int_map = _worker_maps[map_path]
+    path = grid_a_star(int_map, start, goal, graph=_worker_graphs[map_path])
+    return path, path_cost(int_map, path)
+
+def read_queries(path):
+    '''
+    Reads route queries from a .csv file with lines of the form
+        map,start_x,start_y,goal_x,goal_y
+    '''
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#'):
+                continue
+            map_path, *coords = (field.strip() for field in row)
+            sx, sy, gx, gy = map(int, coords)
+            yield (map_path, (sx, sy), (gx, gy))
+
+def solve_batch(queries, workers=None, chunksize=32):
+    """
+    Solves route queries in a pool of worker processes.
+
+    Input:
+        queries:            Iterable of (map file, (x, y) start, (x, y) goal)
+
+        (Optional)
+        workers:            Number of worker processes, defaults to the CPU count
+        chunksize:          Number of queries sent to a worker at a time
+
+    Returns:
+        Generator which yields (query, path, cost) for every query, in the
+        order of the queries, as soon as each result and all results before
+        it are done. path and cost are None for unreachable goals.
+    """
+    queries = list(queries)
+    map_paths = sorted({map_path for map_path, _, _ in queries})
+    # Create the .npy caches up front, so workers only ever memory map them,
+    # and compile every map once into shared memory
+    graphs = {map_path: compile_map(load_int_map(map_path)).share() for map_path in map_paths}
+    handles = {map_path: graph.handle for map_path, graph in graphs.items()}
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(handles,)) as executor:
+            for query, (path, cost) in zip(queries, executor.map(_solve, queries, chunksize=chunksize)):
+                yield query, path, cost
+    finally:
+        for graph in graphs.values():
+            graph.unlink()
+
+def random_queries(n, map_paths=SAMFUNDET_MAPS, seed=0):
+    '''
+    Generates n queries between random free cells of the given maps.
+    '''
+    rng = np.random.default_rng(seed)
+    free = {map_path: np.argwhere(load_int_map(map_path) != Map_Obj.OBSTACLE_CELL) for map_path in map_paths}
+    for _ in range(n):
+        map_path = map_paths[rng.integers(len(map_paths))]
+        start, goal = free[map_path][rng.choice(len(free[map_path]), 2, replace=False)]
+        yield (map_path, tuple(int(c) for c in start), tuple(int(c) for c in goal))
+
+def main():
+    '''
+    Usage: batch_solve.py [queries.csv] [workers]
+    Without a query file, 2000 random queries over the Samfundet maps are solved.
+    Results are written to stdout as map,start_x,start_y,goal_x,goal_y,cost,path
+    '''
+    if len(sys.argv) > 1:
+        queries = list(read_queries(sys.argv[1]))
+    else:
+        queries = list(random_queries(2000))
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    writer = csv.writer(sys.stdout)
+    t = time.perf_counter()
+    for (map_path, start, goal), path, cost in solve_batch(queries, workers=workers):
+        route = ' '.join(f"{x}:{y}" for x, y in path) if path else ''
+        writer.writerow([map_path, *start, *goal, cost, route])
+    seconds = time.perf_counter() - t
+
+    print(f"{len(queries)} queries in {seconds:.2f} s with {workers} workers "
+          f"({len(queries) / seconds:.0f} queries/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from a_star import a_star, lazy_a_star
+from adjacency import CSRGraph
+from bidirectional import grid_bidirectional_a_star
+from bucket_queue import BucketQueue
+from grid_a_star import grid_a_star, path_cost
+from hda_star import hda_star
+from hpa_star import HierarchicalMap
+from jps import JumpPointSearch
+from Map import Map_Obj
+from min_heap import IndexedMinHeap
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+from search_stats import MeetingStats, ParallelStats, SearchStats
+
+
+def random_map(size, density, weighted, seed):
+    '''
+    Square map with obstacles scattered independently with the given density.
+    Free cells cost 1, or a uniformly drawn 1 - 4 when weighted.
+    '''
+    rng = np.random.default_rng(seed)
+    int_map = rng.integers(1, 5, (size, size)) if weighted else np.ones((size, size), dtype=np.int64)
+    int_map[rng.random((size, size)) < density] = Map_Obj.OBSTACLE_CELL
+    return int_map
+
+def maze_map(size, weighted, seed):
+    '''
+    Square maze carved by a randomised depth first search, with corridors and
+    walls one cell wide. Free cells cost 1, or a uniformly drawn 1 - 4 when
+    weighted.
+    '''
+    rng = np.random.default_rng(seed)
+    costs = rng.integers(1, 5, (size, size)) if weighted else np.ones((size, size), dtype=np.int64)
+    int_map = np.full((size, size), Map_Obj.OBSTACLE_CELL, dtype=np.int64)
+
+    # Maze nodes sit on even coordinates, the cells between them are walls
+    n = (size + 1) // 2
+    visited = np.zeros((n, n), dtype=bool)
+    visited[0, 0] = True
+    int_map[0, 0] = costs[0, 0]
+    stack = [(0, 0)]
+    moves = ((1, 0), (0, 1), (-1, 0), (0, -1))
+    while stack:
+        x, y = stack[-1]
+        options = [
+            (x + dx, y + dy) for dx, dy in moves
+            if 0 <= x + dx < n and 0 <= y + dy < n and not visited[x + dx, y + dy]
+        ]
+        if not options:
+            stack.pop()
+            continue
+        x_, y_ = options[rng.integers(len(options))]
+        visited[x_, y_] = True
+        int_map[x + x_, y + y_] = costs[x + x_, y + y_]
+        int_map[2 * x_, 2 * y_] = costs[2 * x_, 2 * y_]
+        stack.append((x_, y_))
+    return int_map
+
+def make_map(kind, size, density, weighted, seed):
+    '''
+    Generates a benchmark map, with start and goal in opposite corners.
+    '''
+    if kind == 'maze':
+        int_map = maze_map(size, weighted, seed)
+        goal = ((size - 1) // 2 * 2, (size - 1) // 2 * 2)
+    else:
+        int_map = random_map(size, density, weighted, seed)
+        # Keep the corners open, so start and goal are rarely walled in
+        int_map[:3, :3] = np.maximum(int_map[:3, :3], 1)
+        int_map[-3:, -3:] = np.maximum(int_map[-3:, -3:], 1)
+        goal = (size - 1, size - 1)
+    return int_map, (0, 0), goal
+
+
+class BenchmarkMap:
+    """
+    Minimal stand-in for Map_Obj, exposing what the part_1_and_2 functions
+    use without building a string map.
+    """
+    def __init__(self, int_map, start_pos, goal_pos):
+        self.int_map = int_map
+        self.start_pos = list(start_pos)
+        self.goal_pos = list(goal_pos)
+
+    def get_cell_value(self, pos):
+        return self.int_map[pos[0], pos[1]]
+
+    def get_goal_pos(self):
+        return self.goal_pos
+
+    def get_start_pos(self):
+        return self.start_pos
+
+
+def run_a_star(queue_factory):
+    def run(int_map, start, goal):
+        map_ = BenchmarkMap(int_map, start, goal)
+        stats = SearchStats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = a_star((map_, *start), manhattan, successors_gen, goal_predicate,
+                          cost_func=cost_func, queue_factory=queue_factory, stats=stats)
+        counters = stats.as_dict()
+        counters['heap_ops'] = counters.pop('queue_ops')
+        return path, counters
+    return run
+
+def run_lazy_a_star(int_map, start, goal):
+    map_ = BenchmarkMap(int_map, start, goal)
+    stats = SearchStats()
+    path = lazy_a_star((map_, *start), manhattan, successors_gen, goal_predicate, cost_func=cost_func, stats=stats)
+    counters = stats.as_dict()
+    counters['heap_ops'] = counters.pop('queue_ops')
+    return path, counters
+
+def run_grid_a_star(int_map, start, goal):
+    return grid_a_star(int_map, start, goal), {}
+
+def run_grid_a_star_csr(int_map, start, goal):
+    t = time.perf_counter()
+    graph = CSRGraph.build(int_map)
+    build_time = time.perf_counter() - t
+    return grid_a_star(int_map, start, goal, graph=graph), {'build_time': build_time}
+
+def run_grid_bidirectional(int_map, start, goal):
+    stats = MeetingStats()
+    path = grid_bidirectional_a_star(int_map, start, goal, stats=stats)
+    return path, {'expansions': stats.expansions, 'meeting_point': stats.meeting_point}
+
+def run_hda_star(int_map, start, goal):
+    stats = ParallelStats()
+    path = hda_star(int_map, start, goal, stats=stats)
+    # tracemalloc only sees the calling process, not the workers
+    return path, {
+        'expansions': stats.expansions,
+        'load_balance': stats.load_balance,
+        'batches': stats.batches,
+        'peak_memory_scope': 'parent process only',
+    }
+
+def run_jps(int_map, start, goal):
+    jps = JumpPointSearch(int_map)
+    path = jps.search(start, goal)
+    return path, {'expansions': jps.expansions}
+
+def run_hpa_star(int_map, start, goal):
+    t = time.perf_counter()
+    hmap = HierarchicalMap(int_map, cluster_size=max(10, int(int_map.shape[0] ** 0.5)))
+    build_time = time.perf_counter() - t
+    return hmap.find_path(start, goal), {'build_time': build_time}
+
+
+# Search modes and frontier backends, with the largest map (in cells) each
+# is run on, so the slower ones do not dominate runs on big maps
+MODES = {
+    'a_star': (run_a_star(IndexedMinHeap), 1000 * 1000),
+    'a_star_bucket': (run_a_star(BucketQueue), 1000 * 1000),
+    'a_star_lazy': (run_lazy_a_star, 1000 * 1000),
+    'grid_a_star': (run_grid_a_star, None),
+    'grid_a_star_csr': (run_grid_a_star_csr, None),
+    'grid_bidirectional': (run_grid_bidirectional, None),
+    'hda_star': (run_hda_star, 1000 * 1000),
+    'jps': (run_jps, None),
+    'hpa_star': (run_hpa_star, 200 * 200),
+}
+
+
+def measure(run, int_map, start, goal, memory=True):
+    '''
+    Runs a search mode once for timing and, since tracing slows the search
+    down, once more under tracemalloc for peak memory. Peak memory only
+    covers the calling process, which modes searching in worker processes
+    mark with a peak_memory_scope. Searches which run out of stack or
+    memory are recorded as errors.
+    '''
+    t = time.perf_counter()
+    try:
+        path, counters = run(int_map, start, goal)
+    except (RecursionError, MemoryError) as e:
+        return {'error': type(e).__name__}
+    result = {
+        'wall_time': time.perf_counter() - t,
+        'found': path is not None,
+        'cost': path_cost(int_map, path),
+        'expansions': None,
+        'heap_ops': None,
+        'peak_memory': None,
+    }
+    result.update(counters)
+
+    if memory:
+        tracemalloc.start()
+        run(int_map, start, goal)
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def run_benchmarks(sizes, densities, kinds=('random', 'maze'), weights=(False, True), modes=None, seed=0, memory=True):
+    '''
+    Runs every mode on every generated map, returning one record per run.
+    '''
+    modes = modes or list(MODES)
+    records = []
+    for size in sizes:
+        for kind in kinds:
+            for density in (densities if kind == 'random' else [None]):
+                for weighted in weights:
+                    int_map, start, goal = make_map(kind, size, density, weighted, seed)
+                    spec = {
+                        'kind': kind,
+                        'size': size,
+                        'density': density,
+                        'weighted': weighted,
+                        'seed': seed,
+                        'obstacle_fraction': float(np.mean(int_map == Map_Obj.OBSTACLE_CELL)),
+                    }
+                    for mode in modes:
+                        run, max_cells = MODES[mode]
+                        record = {'map': spec, 'mode': mode}
+                        if max_cells is not None and int_map.size > max_cells:
+                            record['skipped'] = True
+                        else:
+                            record.update(measure(run, int_map, start, goal, memory))
+                        records.append(record)
+                        print(json.dumps(record, sort_keys=True), flush=True)
+    return records
+
+def run_task_benchmarks(tasks=(1, 2, 3, 4, 5), modes=None, memory=True):
+    '''
+    Runs every mode on the maps of the assignment tasks, from the start to
+    the initial goal position, returning one record per run.
+    '''
+    modes = modes or list(MODES)
+    records = []
+    for task in tasks:
+        map_obj = Map_Obj(task=task)
+        int_map, start, goal = map_obj.int_map, tuple(map_obj.get_start_pos()), tuple(map_obj.get_goal_pos())
+        for mode in modes:
+            record = {'map': {'task': task}, 'mode': mode}
+            record.update(measure(MODES[mode][0], int_map, start, goal, memory))
+            records.append(record)
+            print(json.dumps(record, sort_keys=True), flush=True)
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the search modes on generated maps.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000],
+                        help='side lengths of the generated maps, up to 4000')
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.0, 0.2, 0.35],
+                        help='obstacle densities of the random maps')
+    parser.add_argument('--kinds', nargs='+', default=['random', 'maze'], choices=['random', 'maze'])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--tasks', type=int, nargs='+', choices=range(1, 6),
+                        help='run on the maps of these assignment tasks instead of generated maps')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    if args.tasks:
+        records = run_task_benchmarks(args.tasks, modes=args.modes, memory=not args.no_memory)
+    else:
+        records = run_benchmarks(args.sizes, args.densities, kinds=args.kinds, modes=args.modes,
+                                 seed=args.seed, memory=not args.no_memory)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'results': records,
+        }, f, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
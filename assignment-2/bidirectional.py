@@ -0,0 +1,275 @@
+import contextlib
+import heapq
+import io
+import itertools
+import time
+
+import numpy as np
+
+from a_star import a_star
+from grid_a_star import (grid_a_star, heuristic_array, move_table, neighbour_masks, path_cost, reconstruct_path,
+                         resolve_heuristic, to_index)
+from Map import Map_Obj
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+from search_stats import MeetingStats, SearchStats
+
+
+def bidirectional_a_star(start_state, goal_state, heuristic_func, successors_gen, cost_func=lambda *_: 1,
+                         predecessors_gen=None, reverse_heuristic_func=None, stats=None):
+    """
+    Bidirectional A* search, growing one tree forwards from the start and one
+    backwards from the goal until they meet.
+
+    Both searches order their frontier by the average potential
+        p(state) = (heuristic_func(state) - reverse_heuristic_func(state)) / 2
+    which keeps the two directions consistent with each other, so the search
+    may stop as soon as the two frontier minima add up to the cost of the best
+    path through a meeting point seen so far. Both heuristics must be
+    consistent for the returned path to be optimal.
+
+    Input:
+        start_state:        Initial state
+        goal_state:         Goal state, where the backward search starts
+        heuristic_func:     Function of the form (state) -> estimated cost to the goal
+        successors_gen:     Generator which yields all successors for a given state:
+                                state -> yield successor state
+
+        (Optional)
+        cost_func:          Function which returns the cost of a state transition:
+                                from_state, to_state -> cost
+                            Defaults to a cost of one.
+        predecessors_gen:   Generator which yields all states with a transition
+                            into the given state. Defaults to successors_gen,
+                            which is right for undirected maps.
+        reverse_heuristic_func:
+                            Function of the form (state) -> estimated cost from
+                            the start. Defaults to zero.
+        stats:              MeetingStats instance to record expansions per
+                            direction and the meeting point in
+
+    Returns:
+        A list of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        representing a path from start to goal, or None if there is none.
+    """
+    predecessors_gen = predecessors_gen or successors_gen
+    reverse_heuristic_func = reverse_heuristic_func or (lambda state: 0)
+
+    potentials = {}
+    def potential(state):
+        if state not in potentials:
+            potentials[state] = (heuristic_func(state) - reverse_heuristic_func(state)) / 2
+        return potentials[state]
+
+    # Search state of the forward and backward direction, in that order. The
+    # counter breaks ties without comparing states.
+    counter = itertools.count()
+    g = ({start_state: 0}, {goal_state: 0})
+    parent = ({start_state: None}, {goal_state: None})
+    closed = (set(), set())
+    open_ = (
+        [(potential(start_state), next(counter), start_state)],
+        [(-potential(goal_state), next(counter), goal_state)]
+    )
+    signs = (1, -1)
+    expansions = [0, 0]
+
+    # Cost of the best path found so far, and the state where its halves meet
+    best, meeting_point, updates = (0, start_state, 1) if start_state == goal_state else (float('inf'), None, 0)
+
+    while True:
+        # Drop entries of states expanded through a cheaper entry already
+        for d in (0, 1):
+            while open_[d] and open_[d][0][2] in closed[d]:
+                heapq.heappop(open_[d])
+        if not open_[0] or not open_[1] or open_[0][0][0] + open_[1][0][0] >= best:
+            break
+
+        # Expand the direction with the smaller frontier
+        d = 0 if len(open_[0]) <= len(open_[1]) else 1
+        _, _, u = heapq.heappop(open_[d])
+        closed[d].add(u)
+        expansions[d] += 1
+
+        g_d, g_other = g[d], g[1 - d]
+        g_u = g_d[u]
+        for v in (successors_gen(u) if d == 0 else predecessors_gen(u)):
+            g_v = g_u + (cost_func(u, v) if d == 0 else cost_func(v, u))
+            if v in g_other and g_v + g_other[v] < best:
+                best = g_v + g_other[v]
+                meeting_point = v
+                updates += 1
+            if v in closed[d]:
+                continue
+            if g_v < g_d.get(v, float('inf')):
+                g_d[v] = g_v
+                parent[d][v] = u
+                heapq.heappush(open_[d], (g_v + signs[d] * potential(v), next(counter), v))
+
+    if stats is not None:
+        stats.forward_expansions, stats.backward_expansions = expansions
+        stats.meeting_updates = updates
+        stats.meeting_point = meeting_point[1:] if meeting_point is not None else None
+        stats.cost = best if meeting_point is not None else None
+
+    if meeting_point is None:
+        return None
+
+    # Join the forward half, up to and including the meeting point, with
+    # the backward half after it
+    path = []
+    state = meeting_point
+    while state is not None:
+        path.append(state)
+        state = parent[0][state]
+    path.reverse()
+    state = parent[1].get(meeting_point)
+    while state is not None:
+        path.append(state)
+        state = parent[1][state]
+    return [state[1:] for state in path]
+
+
+def grid_bidirectional_a_star(int_map, start, goal, heuristic=None, connectivity=4, corner_cutting='never',
+                              stats=None, as_array=False):
+    """
+    Bidirectional A* specialised for grid maps, with the search state kept in
+    arrays as in grid_a_star. Moves are symmetric on grid maps, so the
+    backward search walks the same neighbours, paying the cost of the cell
+    it comes from instead of the one it enters.
+
+    Input:
+        int_map:            2D array of cell costs, Map_Obj.OBSTACLE_CELL marks walls
+        start:              Start position (x, y)
+        goal:               Goal position (x, y)
+
+        (Optional)
+        heuristic:          'manhattan', 'euclidean', 'octile' or 'zero',
+                            evaluated towards the goal and towards the start.
+                            Defaults to 'manhattan', or 'octile' with
+                            8-connectivity, as in grid_a_star
+        connectivity:       4 or 8, whether diagonal moves are allowed
+        corner_cutting:     Rule for diagonal moves past obstacles, one of
+                            'never', 'one_side' and 'always'
+        stats:              MeetingStats instance to record expansions per
+                            direction and the meeting point in
+        as_array:           Return the path as an (n, 2) integer array instead
+
+    Returns:
+        A list of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        representing a path from start to goal, or None if there is none.
+    """
+    height, width = int_map.shape
+    n = height * width
+    costs = memoryview(np.ascontiguousarray(int_map.ravel()))
+    heuristic = resolve_heuristic(heuristic, connectivity)
+    potential = memoryview(
+        (heuristic_array(int_map, goal, heuristic) - heuristic_array(int_map, start, heuristic)) / 2
+    )
+    masks = neighbour_masks(int_map, connectivity, corner_cutting).ravel().tolist()
+    moves = move_table(width)
+
+    s = to_index(start, width)
+    t = to_index(goal, width)
+
+    # Search state of the forward and backward direction, in that order
+    parent_arrays = (np.full(n, -1, dtype=np.int64), np.full(n, -1, dtype=np.int64))
+    parent = tuple(memoryview(array) for array in parent_arrays)
+    g = (memoryview(np.full(n, np.inf)), memoryview(np.full(n, np.inf)))
+    closed = (memoryview(np.zeros(n, dtype=bool)), memoryview(np.zeros(n, dtype=bool)))
+    g[0][s] = 0
+    g[1][t] = 0
+    open_ = ([(potential[s], s)], [(-potential[t], t)])
+    signs = (1, -1)
+    expansions = [0, 0]
+
+    best, meeting_point, updates = (0, s, 1) if s == t else (float('inf'), -1, 0)
+
+    while True:
+        for d in (0, 1):
+            while open_[d] and closed[d][open_[d][0][1]]:
+                heapq.heappop(open_[d])
+        if not open_[0] or not open_[1] or open_[0][0][0] + open_[1][0][0] >= best:
+            break
+
+        d = 0 if len(open_[0]) <= len(open_[1]) else 1
+        _, u = heapq.heappop(open_[d])
+        closed_d, g_d, g_other, parent_d, heap, sign = closed[d], g[d], g[1 - d], parent[d], open_[d], signs[d]
+        closed_d[u] = True
+        expansions[d] += 1
+
+        g_u = g_d[u]
+        backward_cost = costs[u]
+        for offset, _, step in moves[masks[u]]:
+            v = u + offset
+            g_v = g_u + (costs[v] if d == 0 else backward_cost) * step
+            if g_v + g_other[v] < best:
+                best = g_v + g_other[v]
+                meeting_point = v
+                updates += 1
+            if closed_d[v]:
+                continue
+            if g_v < g_d[v]:
+                g_d[v] = g_v
+                parent_d[v] = u
+                heapq.heappush(heap, (g_v + sign * potential[v], v))
+
+    if stats is not None:
+        stats.forward_expansions, stats.backward_expansions = expansions
+        stats.meeting_updates = updates
+        stats.meeting_point = divmod(meeting_point, width) if meeting_point != -1 else None
+        stats.cost = best if meeting_point != -1 else None
+
+    if meeting_point == -1:
+        return None
+
+    forward = reconstruct_path(parent_arrays[0], meeting_point, width, as_array=True)
+    backward = reconstruct_path(parent_arrays[1], meeting_point, width, as_array=True)
+    path = np.concatenate((forward, backward[::-1][1:]))
+    if as_array:
+        return path
+    return list(map(tuple, path.tolist()))
+
+
+def main():
+    # Imported here, since the benchmark itself runs the grid search above
+    from benchmark import BenchmarkMap, make_map
+
+    print(f"{'map':>15} {'a_star':>8} {'bidir':>8} {'meeting point':>14} "
+          f"{'grid_a_star':>12} {'grid_bidir':>11} {'cost':>6}")
+
+    cases = []
+    for task in range(1, 5):
+        map_obj = Map_Obj(task=task)
+        cases.append((f"task {task}", map_obj.int_map, tuple(map_obj.get_start_pos()), tuple(map_obj.get_goal_pos())))
+    for kind in ('random', 'maze'):
+        int_map, start, goal = make_map(kind, 300, 0.2, True, 0)
+        cases.append((f"{kind} 300x300", int_map, start, goal))
+
+    for name, int_map, start, goal in cases:
+        map_ = BenchmarkMap(int_map, start, goal)
+        start_state, goal_state = (map_, *start), (map_, *goal)
+
+        forward_stats = SearchStats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            a_star(start_state, manhattan, successors_gen, goal_predicate, cost_func=cost_func, stats=forward_stats)
+
+        meeting_stats = MeetingStats()
+        from_start = lambda state: abs(state[1] - start[0]) + abs(state[2] - start[1])
+        bidirectional_a_star(start_state, goal_state, manhattan, successors_gen, cost_func=cost_func,
+                             reverse_heuristic_func=from_start, stats=meeting_stats)
+
+        t = time.perf_counter()
+        path = grid_a_star(int_map, start, goal)
+        grid_time = time.perf_counter() - t
+        t = time.perf_counter()
+        grid_bidirectional_a_star(int_map, start, goal)
+        bidirectional_time = time.perf_counter() - t
+
+        print(f"{name:>15} {forward_stats.expansions:>8} {meeting_stats.expansions:>8} "
+              f"{str(meeting_stats.meeting_point):>14} {grid_time * 1000:>9.2f} ms "
+              f"{bidirectional_time * 1000:>8.2f} ms {path_cost(int_map, path)!s:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+from collections import deque
+
+
+class BucketQueue():
+    """
+    Bucket queue (Dial's algorithm) for non-negative integer keys, exposing
+    the same interface as MinHeap. Every key owns a bucket, and a cursor
+    walks the buckets upwards, so insertion and extraction are O(1)
+    amortised when keys are extracted in non-decreasing order, as in A*
+    with a consistent heuristic and integer cell costs.
+
+    Nodes must be hashable and unique within the queue. Superseded bucket
+    entries left behind by decrease_key are skipped lazily on extraction.
+
+    tie_breaking selects the order within a bucket: 'lifo' extracts the
+    most recently inserted node first, 'fifo' the least recently inserted.
+    """
+    def __init__(self, data=None, key_attr=None, tie_breaking='lifo'):
+        if tie_breaking not in ('lifo', 'fifo'):
+            raise ValueError(f"Unknown tie breaking rule '{tie_breaking}'.")
+        self.lifo = tie_breaking == 'lifo'
+
+        # Function for accessing key for given node
+        self.key_attr = key_attr
+        if key_attr is None:
+            self.node_to_key = lambda node: node
+        else:
+            self.node_to_key = lambda node: getattr(node, key_attr)
+
+        # Maps from bucket key to the nodes inserted with that key
+        self.buckets = {}
+        # Maps from node to the key of its current bucket
+        self.keys = {}
+        # Lowest key which may hold a node
+        self.cursor = 0
+
+        for node in data or []:
+            self.insert(node)
+
+    # Public functions
+    def insert(self, node):
+        if node in self.keys:
+            raise ValueError('The node is already in the queue.')
+        self._push(node, BucketQueue._bucket_key(self.node_to_key(node)))
+
+    def minimum(self):
+        return self._advance()
+
+    def extract_min(self):
+        node = self._advance()
+        self._pop_bucket_entry()
+        del self.keys[node]
+        return node
+
+    def decrease_key_noderef(self, node, key):
+        k = BucketQueue._bucket_key(key)
+        if k > self.keys[node]:
+            raise ValueError(
+                'Key cannot be replaced with a key of lower priority.')
+
+        # Update key
+        if self.key_attr is not None:
+            setattr(node, self.key_attr, key)
+
+        # The old bucket entry goes stale and is skipped when reached
+        if k != self.keys[node]:
+            self._push(node, k)
+
+    def is_empty(self):
+        return not self.keys
+
+    # Private functions
+    def _push(self, node, k):
+        self.keys[node] = k
+        if k not in self.buckets:
+            self.buckets[k] = deque()
+        self.buckets[k].append(node)
+        if k < self.cursor:
+            self.cursor = k
+
+    def _advance(self):
+        '''
+        Moves the cursor to the lowest bucket holding a live node, and
+        returns that node without removing it.
+        '''
+        if self.is_empty():
+            raise IndexError('The queue is empty.')
+
+        while True:
+            bucket = self.buckets.get(self.cursor)
+            while bucket:
+                node = bucket[-1] if self.lifo else bucket[0]
+                if self.keys.get(node) == self.cursor:
+                    return node
+                self._pop_bucket_entry()
+            self.buckets.pop(self.cursor, None)
+            self.cursor += 1
+
+    def _pop_bucket_entry(self):
+        bucket = self.buckets[self.cursor]
+        if self.lifo:
+            bucket.pop()
+        else:
+            bucket.popleft()
+
+    # Special methods
+    def __len__(self):
+        return len(self.keys)
+
+    def __str__(self):
+        return str([str(node) for node in self.keys])
+
+    def __contains__(self, elem):
+        return elem in self.keys
+
+    # Static methods
+    @staticmethod
+    def _bucket_key(key):
+        k = int(key)
+        if k != key or k < 0:
+            raise ValueError('Bucket queue keys must be non-negative integers.')
+        return k
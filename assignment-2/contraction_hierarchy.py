@@ -0,0 +1,337 @@
+import contextlib
+import heapq
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from a_star import a_star
+from distance_field import map_hash
+from grid_a_star import grid_a_star, path_cost, to_index, to_pos
+from Map import MAP_DIR, Map_Obj
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+
+SAMFUNDET_MAPS = {1: 'Samfundet_map_1.csv', 2: 'Samfundet_map_2.csv', 3: 'Samfundet_map_Edgar_full.csv'}
+
+# Number of nodes a witness search may settle before giving up, in which
+# case a possibly unneeded shortcut is added
+WITNESS_SETTLE_LIMIT = 64
+
+
+def _witness_search(out, contracted, source, excluded, limit, targets):
+    '''
+    Dijkstra from source over the remaining graph without the excluded node,
+    up to the cost limit. Returns the distances found to the target nodes.
+    '''
+    dist = {source: 0}
+    open_ = [(0, source)]
+    remaining = set(targets)
+    settled = 0
+    while open_ and remaining and settled < WITNESS_SETTLE_LIMIT:
+        d_u, u = heapq.heappop(open_)
+        if d_u > dist[u]:
+            continue
+        if d_u > limit:
+            break
+        settled += 1
+        remaining.discard(u)
+        for v, w in out[u].items():
+            if v == excluded or contracted[v]:
+                continue
+            if d_u + w < dist.get(v, float('inf')):
+                dist[v] = d_u + w
+                heapq.heappush(open_, (d_u + w, v))
+    return {target: dist[target] for target in targets if target in dist}
+
+def _shortcuts(out, inn, contracted, v):
+    '''
+    Shortcuts needed to keep all shortest paths through v when contracting it,
+    as (from, to, cost) triples.
+    '''
+    ins = [(u, w) for u, w in inn[v].items() if not contracted[u]]
+    outs = [(x, w) for x, w in out[v].items() if not contracted[x]]
+    if not ins or not outs:
+        return []
+
+    max_out = max(w for _, w in outs)
+    shortcuts = []
+    for u, w_uv in ins:
+        through = {x: w_uv + w_vx for x, w_vx in outs if x != u}
+        if not through:
+            continue
+        witnesses = _witness_search(out, contracted, u, v, w_uv + max_out, through)
+        for x, cost in through.items():
+            if witnesses.get(x, float('inf')) > cost:
+                shortcuts.append((u, x, cost))
+    return shortcuts
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over the cells of a map, for answering many route
+    queries on a static map.
+
+    Preprocessing contracts the cells one by one, from least to most
+    important, adding shortcut edges which preserve the shortest paths through
+    every contracted cell. A query then runs a bidirectional Dijkstra which
+    only ever moves up the hierarchy, settling a few dozen cells instead of
+    most of the map, and unpacks the shortcuts of the route found.
+
+    Edges are directed, since moving between two cells costs the value of
+    the cell entered. The upward graph is kept per direction in compressed
+    sparse row form: fwd_* holds the edges from each cell to higher ranked
+    cells, bwd_* the edges into each cell from higher ranked cells. A middle
+    of -1 marks an original edge, otherwise the cell a shortcut skips.
+    """
+    ARRAYS = (
+        'rank',
+        'fwd_offsets', 'fwd_targets', 'fwd_weights', 'fwd_middles',
+        'bwd_offsets', 'bwd_targets', 'bwd_weights', 'bwd_middles',
+    )
+
+    def __init__(self, shape, **arrays):
+        self.shape = tuple(shape)
+        self.width = self.shape[1]
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+        # Adjacency lists and shortcut middles for queries, which index them
+        # far faster than the arrays
+        self._fwd = self._adjacency('fwd')
+        self._bwd = self._adjacency('bwd')
+        self._middle = {}
+        for direction in ('fwd', 'bwd'):
+            offsets, targets, middles = (getattr(self, f"{direction}_{name}") for name in ('offsets', 'targets', 'middles'))
+            sources = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+            for source, target, middle in zip(sources.tolist(), targets.tolist(), middles.tolist()):
+                edge = (source, target) if direction == 'fwd' else (target, source)
+                self._middle[edge] = middle
+
+    def _adjacency(self, direction):
+        offsets = getattr(self, f"{direction}_offsets").tolist()
+        targets = getattr(self, f"{direction}_targets").tolist()
+        weights = getattr(self, f"{direction}_weights").tolist()
+        return [list(zip(targets[a:b], weights[a:b])) for a, b in zip(offsets, offsets[1:])]
+
+    @classmethod
+    def build(cls, map_obj, successors_gen=successors_gen, cost_func=cost_func):
+        '''
+        Contracts the graph given by successors_gen and cost_func over the
+        free cells of the map.
+        '''
+        int_map = map_obj.int_map
+        n = int_map.size
+        width = int_map.shape[1]
+        out = [{} for _ in range(n)]
+        inn = [{} for _ in range(n)]
+        nodes = [to_index(pos, width) for pos in np.argwhere(int_map != Map_Obj.OBSTACLE_CELL)]
+        for u in nodes:
+            u_state = (map_obj, *to_pos(u, width))
+            for v_state in successors_gen(u_state):
+                v = to_index(v_state[1:], width)
+                out[u][v] = inn[v][u] = cost_func(u_state, v_state)
+
+        contracted = [False] * n
+        deleted_neighbours = [0] * n
+        rank = np.full(n, -1, dtype=np.int64)
+        middle = {}
+
+        def priority(v):
+            shortcuts = _shortcuts(out, inn, contracted, v)
+            removed = sum(not contracted[u] for u in inn[v]) + sum(not contracted[x] for x in out[v])
+            return len(shortcuts) - removed + deleted_neighbours[v], shortcuts
+
+        # Contract by edge difference, updating priorities lazily
+        queue = [(priority(v)[0], v) for v in nodes]
+        heapq.heapify(queue)
+        order = 0
+        while queue:
+            _, v = heapq.heappop(queue)
+            key, shortcuts = priority(v)
+            if queue and key > queue[0][0]:
+                heapq.heappush(queue, (key, v))
+                continue
+
+            for u, x, cost in shortcuts:
+                if cost < out[u].get(x, float('inf')):
+                    out[u][x] = inn[x][u] = cost
+                    middle[(u, x)] = v
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            for u in set(inn[v]) | set(out[v]):
+                deleted_neighbours[u] += 1
+
+        arrays = {'rank': rank}
+        for direction, edges in (('fwd', out), ('bwd', inn)):
+            offsets, targets, weights, middles = [0], [], [], []
+            for u in range(n):
+                for x, w in edges[u].items():
+                    if rank[x] > rank[u]:
+                        targets.append(x)
+                        weights.append(w)
+                        middles.append(middle.get((u, x) if direction == 'fwd' else (x, u), -1))
+                offsets.append(len(targets))
+            arrays[f"{direction}_offsets"] = np.array(offsets, dtype=np.int64)
+            arrays[f"{direction}_targets"] = np.array(targets, dtype=np.int64)
+            arrays[f"{direction}_weights"] = np.array(weights, dtype=np.float64)
+            arrays[f"{direction}_middles"] = np.array(middles, dtype=np.int64)
+        return cls(int_map.shape, **arrays)
+
+    @classmethod
+    def load_or_build(cls, csv_path, map_obj):
+        '''
+        Loads the hierarchy stored next to the map file, rebuilding and
+        storing it again if the map content changed.
+        '''
+        ch_path = os.path.splitext(csv_path)[0] + '.ch.npz'
+        digest = map_hash(map_obj.int_map)
+        if os.path.exists(ch_path):
+            stored = np.load(ch_path)
+            if str(stored['map_hash']) == digest:
+                return cls(map_obj.int_map.shape, **{name: stored[name] for name in cls.ARRAYS})
+
+        ch = cls.build(map_obj)
+        ch.save(ch_path, digest)
+        return ch
+
+    def save(self, path, digest):
+        np.savez(path, map_hash=digest, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def query(self, start, goal):
+        '''
+        Cheapest path from start to goal, as a list of (x, y) positions like
+        the paths of a_star, or None if there is none.
+        '''
+        s = to_index(start, self.width)
+        t = to_index(goal, self.width)
+        if s == t:
+            return [to_pos(s, self.width)]
+
+        # Forward and backward search state, in that order
+        dist = ({s: 0}, {t: 0})
+        parent = ({s: None}, {t: None})
+        open_ = ([(0, s)], [(0, t)])
+        graphs = (self._fwd, self._bwd)
+        best, meeting_point = float('inf'), None
+
+        while open_[0] or open_[1]:
+            for d in (0, 1):
+                if not open_[d]:
+                    continue
+                d_u, u = heapq.heappop(open_[d])
+                if d_u > dist[d][u]:
+                    continue
+                # Neither direction can improve on paths at least as long as best
+                if d_u >= best:
+                    open_[d].clear()
+                    continue
+                if u in dist[1 - d] and d_u + dist[1 - d][u] < best:
+                    best = d_u + dist[1 - d][u]
+                    meeting_point = u
+                for v, w in graphs[d][u]:
+                    if d_u + w < dist[d].get(v, float('inf')):
+                        dist[d][v] = d_u + w
+                        parent[d][v] = u
+                        heapq.heappush(open_[d], (d_u + w, v))
+
+        if meeting_point is None:
+            return None
+
+        # Chain of hierarchy edges from start to goal, through the meeting point
+        chain = []
+        u = meeting_point
+        while u is not None:
+            chain.append(u)
+            u = parent[0][u]
+        chain.reverse()
+        u = parent[1][meeting_point]
+        while u is not None:
+            chain.append(u)
+            u = parent[1][u]
+
+        # Unpack shortcuts into the cells they skip
+        path = [chain[0]]
+        for u, x in zip(chain, chain[1:]):
+            stack = [(u, x)]
+            while stack:
+                a, b = stack.pop()
+                m = self._middle[(a, b)]
+                if m == -1:
+                    path.append(b)
+                else:
+                    stack.append((m, b))
+                    stack.append((a, m))
+        return [to_pos(index, self.width) for index in path]
+
+
+def contraction_hierarchy(map_obj):
+    '''
+    Returns the contraction hierarchy of the map of the given Map_Obj, using
+    the hierarchy stored next to the map file.
+    '''
+    csv_path = os.path.join(MAP_DIR, map_obj.path_to_map)
+    return ContractionHierarchy.load_or_build(csv_path, map_obj)
+
+def main():
+    print(f"{'map':>30} {'build':>9} {'index':>9} {'query':>9} {'a_star':>9} {'grid_a_star':>11}")
+    task_maps = {1: 1, 2: 2, 3: 4}
+    rng = np.random.default_rng(0)
+    for key, task in task_maps.items():
+        map_obj = Map_Obj(task=task)
+        int_map = map_obj.int_map
+
+        t = time.perf_counter()
+        ch = ContractionHierarchy.build(map_obj)
+        build_time = time.perf_counter() - t
+
+        free = np.argwhere(int_map != Map_Obj.OBSTACLE_CELL)
+        queries = [tuple(tuple(int(c) for c in free[i]) for i in rng.choice(len(free), 2, replace=False))
+                   for _ in range(200)]
+        timings = {'ch': 0.0, 'a_star': 0.0, 'grid_a_star': 0.0}
+        for start, goal in queries:
+            t = time.perf_counter()
+            ch_path = ch.query(start, goal)
+            timings['ch'] += time.perf_counter() - t
+
+            map_obj.goal_pos = list(goal)
+            t = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                path = a_star((map_obj, *start), manhattan, successors_gen, goal_predicate, cost_func=cost_func)
+            timings['a_star'] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            grid_a_star(int_map, start, goal)
+            timings['grid_a_star'] += time.perf_counter() - t
+
+            if path_cost(int_map, ch_path) != path_cost(int_map, path):
+                raise RuntimeError(f"Contraction hierarchy path from {start} to {goal} is not optimal.")
+
+        per_query = {name: total / len(queries) * 1e6 for name, total in timings.items()}
+        print(f"{SAMFUNDET_MAPS[key]:>30} {build_time:>7.2f} s {ch.nbytes / 1024:>6.0f} kB "
+              f"{per_query['ch']:>6.0f} us {per_query['a_star']:>6.0f} us {per_query['grid_a_star']:>8.0f} us")
+
+        # The stored hierarchy must load unchanged, and a changed map must be rebuilt
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, SAMFUNDET_MAPS[key])
+            ch.save(os.path.splitext(csv_path)[0] + '.ch.npz', map_hash(int_map))
+            loaded = ContractionHierarchy.load_or_build(csv_path, map_obj)
+            if not all(np.array_equal(getattr(loaded, name), getattr(ch, name)) for name in ch.ARRAYS):
+                raise RuntimeError(f"The stored hierarchy of {SAMFUNDET_MAPS[key]} did not load unchanged.")
+
+            start, goal = queries[0]
+            int_map[tuple(free[len(free) // 2])] = Map_Obj.OBSTACLE_CELL
+            rebuilt = ContractionHierarchy.load_or_build(csv_path, map_obj)
+            expected = path_cost(int_map, grid_a_star(int_map, start, goal))
+            if (all(np.array_equal(getattr(rebuilt, name), getattr(ch, name)) for name in ch.ARRAYS)
+                    or path_cost(int_map, rebuilt.query(start, goal)) != expected):
+                raise RuntimeError(f"The hierarchy of the changed {SAMFUNDET_MAPS[key]} was not rebuilt.")
+
+if __name__ == "__main__":
+    main()
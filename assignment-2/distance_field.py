@@ -0,0 +1,187 @@
+import hashlib
+import heapq
+import weakref
+
+import numpy as np
+
+from Map import Map_Obj, map_version
+from grid_a_star import MOVES, to_index
+from lru import LRUCache
+
+
+def map_hash(int_map):
+    '''
+    Returns a digest of the map content, used as cache key for precomputed
+    search data.
+    '''
+    digest = hashlib.sha1(str((int_map.shape, int_map.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(int_map).tobytes())
+    return digest.hexdigest()
+
+# Digests of the maps hashed so far and the map version they were hashed at,
+# by array identity, so each map is only hashed again once it changed
+_map_keys = {}
+
+def map_key(int_map):
+    '''
+    Returns map_hash(int_map), computed again only when the map array changed
+    in place since the last call, as recorded by Map.mark_map_changed.
+    '''
+    version = map_version(int_map)
+    entry = _map_keys.get(id(int_map))
+    if entry is not None and entry[0]() is int_map and entry[1] == version:
+        return entry[2]
+
+    digest = map_hash(int_map)
+    array_id = id(int_map)
+    _map_keys[array_id] = (weakref.ref(int_map, lambda _: _map_keys.pop(array_id, None)), version, digest)
+    return digest
+
+def settle_backwards(int_map, dist, open_):
+    '''
+    Runs Dijkstra's algorithm backwards over the map, starting from the
+    (cost-to-go, cell index) pairs in open_ and lowering dist in place.
+    Moving into a cell costs the value of that cell, as in cost_func.
+    '''
+    height, width = int_map.shape
+    costs = int_map.ravel()
+    dist = dist.ravel()
+
+    while open_:
+        d_v, v = heapq.heappop(open_)
+        # Skip stale entries left behind by improved distances
+        if d_v > dist[v]:
+            continue
+
+        # Every neighbour reaches v by paying the cost of v
+        x, y = divmod(v, width)
+        d_u = d_v + costs[v]
+        for dx, dy in MOVES:
+            x_ = x + dx
+            y_ = y + dy
+            if (x_ < 0) or (x_ >= height) or (y_ < 0) or (y_ >= width):
+                continue
+
+            u = x_ * width + y_
+            if costs[u] == Map_Obj.OBSTACLE_CELL:
+                continue
+            if d_u < dist[u]:
+                dist[u] = d_u
+                heapq.heappush(open_, (d_u, u))
+
+def compute_distance_field(int_map, goal):
+    '''
+    Computes the cost of the cheapest path from every cell to the goal.
+    Obstacles and cells which cannot reach the goal are set to infinity.
+    '''
+    dist = np.full(int_map.shape, np.inf)
+    dist[goal[0], goal[1]] = 0
+    settle_backwards(int_map, dist, [(0.0, to_index(goal, int_map.shape[1]))])
+    return dist
+
+
+class DistanceField:
+    """
+    Cost-to-go field towards a single goal. Once built, a path from any
+    start is found by descending the field, in time proportional to the
+    path length.
+    """
+    def __init__(self, int_map, goal, dist=None):
+        self.int_map = int_map
+        self.goal = (goal[0], goal[1])
+        self.dist = compute_distance_field(int_map, goal) if dist is None else dist
+
+    def cost_to_go(self, pos):
+        return self.dist[pos[0], pos[1]]
+
+    def heuristic(self, state):
+        '''
+        Perfect heuristic function for a_star, of the form (state) -> value.
+        '''
+        _, x, y = state
+        return self.dist[x, y]
+
+    def path_from(self, start):
+        '''
+        Follows the field downhill from start. Returns the path as a list of
+        (x, y) positions ending at the goal, or None if the goal is unreachable.
+        '''
+        height, width = self.dist.shape
+        pos = (start[0], start[1])
+        if not np.isfinite(self.dist[pos]):
+            return None
+
+        path = [pos]
+        while pos != self.goal:
+            x, y = pos
+            best, best_value = None, np.inf
+            for dx, dy in MOVES:
+                x_ = x + dx
+                y_ = y + dy
+                if (x_ < 0) or (x_ >= height) or (y_ < 0) or (y_ >= width):
+                    continue
+                if self.int_map[x_, y_] == Map_Obj.OBSTACLE_CELL:
+                    continue
+                value = self.int_map[x_, y_] + self.dist[x_, y_]
+                if value < best_value:
+                    best, best_value = (x_, y_), value
+            pos = best
+            path.append(pos)
+        return path
+
+    @property
+    def nbytes(self):
+        return self.dist.nbytes + self.int_map.nbytes
+
+
+class DistanceFieldCache(LRUCache):
+    """
+    Cache of distance fields, keyed by map content and goal position.
+    """
+    def __init__(self, max_bytes=64 * 2**20):
+        super().__init__(max_bytes)
+
+    def get(self, int_map, goal, key=None):
+        '''
+        Returns the field towards goal on the given map. key identifies the
+        map content, by default its hash as given by map_key.
+        '''
+        key = (key if key is not None else map_key(int_map), (goal[0], goal[1]))
+        return self.lookup(key, lambda: DistanceField(int_map.copy(), goal))
+
+
+# Fields built by distance_field for callers without a cache of their own
+default_cache = DistanceFieldCache()
+
+
+def distance_field(int_map, goal, cache=default_cache, key=None):
+    '''
+    Returns the (possibly cached) distance field towards goal on the given map.
+    '''
+    return cache.get(int_map, goal, key)
+
+
+def main():
+    '''
+    Checks that cached fields follow changes made to a map in place: walls
+    off the cheapest route of task 1 cell by cell, comparing the cached
+    field to one computed from scratch after every change.
+    '''
+    # Imported here, since grid_a_star is only needed for the check
+    from grid_a_star import grid_a_star
+
+    map_obj = Map_Obj(task=1)
+    start, goal = tuple(map_obj.get_start_pos()), tuple(map_obj.get_goal_pos())
+    route = grid_a_star(map_obj.int_map, start, goal)
+    print(f"{'walled off':>10} {'cost':>6}")
+    for pos in [None] + route[1:-1:8]:
+        if pos is not None:
+            map_obj.set_cell_value(pos, Map_Obj.OBSTACLE_CELL, str_map=False)
+        cached = distance_field(map_obj.int_map, goal).cost_to_go(start)
+        expected = compute_distance_field(map_obj.int_map, goal)[start]
+        if cached != expected:
+            raise RuntimeError(f"Cached field gives cost {cached} instead of {expected} after walling off {pos}.")
+        print(f"{str(pos):>10} {cached:>6}")
+
+if __name__ == "__main__":
+    main()
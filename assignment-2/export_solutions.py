@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+import part_1_and_2
+import part_3
+from Map import MAP_DIR
+
+
+def export_solutions(out_dir, scale=20):
+    '''
+    Solves tasks 1 - 5 and writes each solution as a PNG to out_dir, without
+    opening any image viewer. Task 5 is exported both at the regular speed of
+    our friend and at the faster one.
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for task in range(1, 5):
+        name = f"solution_{task}.png"
+        part_1_and_2.solve_task(task).save_map(os.path.join(out_dir, name), scale=scale)
+        written.append(name)
+
+    insayn_speed = part_3.INSAYN_SPEED
+    try:
+        for faster, name in ((False, "solution_5.png"), (True, "solution_5_faster_friend.png")):
+            part_3.INSAYN_SPEED = faster
+            part_3.solve().save_map(os.path.join(out_dir, name), scale=scale)
+            written.append(name)
+    finally:
+        part_3.INSAYN_SPEED = insayn_speed
+
+    return written
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(MAP_DIR, 'solutions')
+    t = time.perf_counter()
+    written = export_solutions(out_dir)
+    print(f"Wrote {len(written)} solutions to {out_dir} in {(time.perf_counter() - t) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from a_star import a_star
+from distance_field import compute_distance_field, settle_backwards
+from grid_a_star import MOVES, to_index
+from Map import Map_Obj
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+
+# MOVES as an array, with a final row of zeros for cells without a direction
+MOVE_OFFSETS = np.array(MOVES + ((0, 0),), dtype=np.int64)
+
+
+class FlowField:
+    """
+    Next step towards the goal of a Map_Obj from every cell, built with one
+    weighted Dijkstra search backwards from the goal. Any number of agents
+    find their way by looking up the direction of the cell they are in.
+
+    directions holds the index into MOVES of the cheapest step out of every
+    cell, or -1 at the goal, at obstacles and at cells which cannot reach it.
+
+    By default the field follows the goal as it moves through
+    Map_Obj.move_goal_pos, updating only the cells which get closer to the
+    new goal position.
+    """
+    def __init__(self, map_obj, follow_goal=True):
+        self.map_obj = map_obj
+        self.int_map = map_obj.int_map
+        self.goal = tuple(map_obj.get_goal_pos())
+        self.dist = compute_distance_field(self.int_map, self.goal)
+        self.directions = self._directions()
+        if follow_goal:
+            map_obj.add_goal_listener(self._on_goal_moved)
+
+    def _on_goal_moved(self, old_pos, new_pos):
+        self.move_goal(new_pos)
+
+    def move_goal(self, goal):
+        '''
+        Updates the field for a new goal position.
+
+        A path to the old goal followed by the cheapest way from the old goal
+        to the new one bounds every new cost-to-go from above. Starting from
+        these bounds, a backwards Dijkstra from the new goal only has to visit
+        the cells whose cost-to-go drops below its bound.
+        '''
+        goal = (goal[0], goal[1])
+        if goal == self.goal:
+            return
+        if self.int_map[goal] == Map_Obj.OBSTACLE_CELL:
+            raise ValueError(f"The goal {goal} is an obstacle.")
+
+        if np.isfinite(self.dist[goal]):
+            # Cost of moving from the old goal to the new one, found by
+            # reversing the path from the new goal to the old one
+            shift = self.dist[goal] - self.int_map[self.goal] + self.int_map[goal]
+            self.dist += shift
+            self.dist[goal] = 0
+            settle_backwards(self.int_map, self.dist, [(0.0, to_index(goal, self.int_map.shape[1]))])
+        else:
+            self.dist = compute_distance_field(self.int_map, goal)
+
+        self.goal = goal
+        self.directions = self._directions()
+
+    def _directions(self):
+        # Cost of stepping into every neighbour and continuing from there
+        height, width = self.int_map.shape
+        through = np.where(self.int_map == Map_Obj.OBSTACLE_CELL, np.inf, self.int_map + self.dist)
+        padded = np.pad(through, 1, constant_values=np.inf)
+        candidates = np.stack([padded[1 + dx:1 + dx + height, 1 + dy:1 + dy + width] for dx, dy in MOVES])
+
+        directions = np.argmin(candidates, axis=0).astype(np.int8)
+        directions[~np.isfinite(self.dist) | ~np.isfinite(candidates.min(axis=0))] = -1
+        directions[self.goal] = -1
+        return directions
+
+    def next_position(self, pos):
+        '''
+        Next position on a cheapest path from pos to the goal, pos itself at
+        the goal or where the goal cannot be reached.
+        '''
+        dx, dy = MOVE_OFFSETS[self.directions[pos[0], pos[1]]]
+        return (pos[0] + int(dx), pos[1] + int(dy))
+
+    def step(self, positions):
+        '''
+        Moves every agent of an (n, 2) array of positions one cell along the
+        field, returning the new positions.
+        '''
+        positions = np.asarray(positions)
+        return positions + MOVE_OFFSETS[self.directions[positions[:, 0], positions[:, 1]]]
+
+    def path_from(self, start):
+        '''
+        Follows the field from start. Returns the path as a list of (x, y)
+        positions ending at the goal, or None if the goal is unreachable.
+        '''
+        pos = (start[0], start[1])
+        if not np.isfinite(self.dist[pos]):
+            return None
+        path = [pos]
+        while pos != self.goal:
+            pos = self.next_position(pos)
+            path.append(pos)
+        return path
+
+    def close(self):
+        '''
+        Stops following the goal of the map.
+        '''
+        if self._on_goal_moved in self.map_obj.goal_listeners:
+            self.map_obj.remove_goal_listener(self._on_goal_moved)
+
+
+def main():
+    map_obj = Map_Obj(task=5)
+    rng = np.random.default_rng(0)
+    free = np.argwhere(map_obj.int_map != Map_Obj.OBSTACLE_CELL)
+    agents = free[rng.choice(len(free), 50, replace=False)]
+
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for start in agents:
+            a_star((map_obj, *start), manhattan, successors_gen, goal_predicate, cost_func=cost_func)
+    a_star_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    field = FlowField(map_obj)
+    build_time = time.perf_counter() - t
+    positions = agents
+    while True:
+        moved = field.step(positions)
+        if (moved == positions).all():
+            break
+        positions = moved
+    print(f"{len(agents)} agents: a_star per agent {a_star_time * 1000:.1f} ms, "
+          f"flow field {build_time * 1000:.1f} ms to build")
+
+    # Let the goal walk to its end position, updating the field on every move
+    incremental, rebuilds, moves = 0.0, 0.0, 0
+    while tuple(map_obj.get_goal_pos()) != tuple(map_obj.get_end_goal_pos()):
+        t = time.perf_counter()
+        map_obj.tick()
+        incremental += time.perf_counter() - t
+        if tuple(map_obj.get_goal_pos()) != field.goal:
+            raise RuntimeError('The field did not follow the goal.')
+        if map_obj.tick_counter % 4 == 1:
+            moves += 1
+            t = time.perf_counter()
+            FlowField(map_obj, follow_goal=False)
+            rebuilds += time.perf_counter() - t
+    print(f"{moves} goal moves: incremental {incremental * 1000:.1f} ms, rebuilding {rebuilds * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import functools
+import heapq
+import math
+
+import numpy as np
+
+from Map import Map_Obj
+
+# Moves between 4-connected cells, as (dx, dy) offsets
+MOVES = ((1, 0), (0, 1), (-1, 0), (0, -1))
+# Moves between 8-connected cells, the diagonal ones last
+MOVES_8 = MOVES + ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# Rules for diagonal moves past obstacles: 'never' requires both cells beside
+# the move to be free, 'one_side' requires one of them and 'always' none
+CORNER_CUTTING = ('never', 'one_side', 'always')
+
+
+def to_index(pos, width):
+    '''
+    Converts a (x, y) map position to its row-major flat cell index.
+    '''
+    return pos[0] * width + pos[1]
+
+def to_pos(index, width):
+    '''
+    Converts a row-major flat cell index back to a (x, y) map position.
+    '''
+    x, y = divmod(int(index), width)
+    return (x, y)
+
+def resolve_heuristic(heuristic, connectivity):
+    '''
+    Returns the heuristic to search with. None picks 'manhattan' on 4- and
+    'octile' on 8-connected maps. Manhattan overestimates diagonal moves,
+    and so is refused on 8-connected maps, where it loses optimality.
+    '''
+    if heuristic is None:
+        return 'octile' if connectivity == 8 else 'manhattan'
+    if connectivity == 8 and isinstance(heuristic, str) and heuristic == 'manhattan':
+        raise ValueError("The manhattan heuristic overestimates diagonal moves, use 'octile' with 8-connectivity.")
+    return heuristic
+
+def heuristic_array(int_map, goal, kind='manhattan'):
+    '''
+    Evaluates the given heuristic for every cell of the map in one go.
+    kind is the name of a heuristic, an array of heuristic values or a
+    function of the form (int_map, goal) -> array of heuristic values.
+    Returns a flat array indexed by cell index.
+    '''
+    if callable(kind):
+        kind = kind(int_map, goal)
+    if isinstance(kind, np.ndarray):
+        return kind.ravel().astype(np.float64, copy=False)
+
+    xs, ys = np.indices(int_map.shape)
+    dx = np.abs(xs - goal[0])
+    dy = np.abs(ys - goal[1])
+    if kind == 'manhattan':
+        h = dx + dy
+    elif kind == 'euclidean':
+        h = np.hypot(dx, dy)
+    elif kind == 'octile':
+        h = dx + dy + (math.sqrt(2) - 2) * np.minimum(dx, dy)
+    elif kind == 'zero':
+        h = np.zeros(int_map.shape)
+    else:
+        raise ValueError(f"Unknown heuristic '{kind}'.")
+    return h.ravel().astype(np.float64)
+
+def neighbour_masks(int_map, connectivity=4, corner_cutting='never'):
+    '''
+    Precomputes the valid moves out of every cell as a bitmask, where bit i
+    is set if moving by MOVES_8[i] stays on the map and enters a free cell.
+    Obstacle cells get an empty mask.
+    '''
+    if connectivity not in (4, 8):
+        raise ValueError(f"Connectivity must be 4 or 8, not {connectivity}.")
+    if corner_cutting not in CORNER_CUTTING:
+        raise ValueError(f"Unknown corner cutting rule '{corner_cutting}'.")
+
+    height, width = int_map.shape
+    free = int_map != Map_Obj.OBSTACLE_CELL
+    padded = np.pad(free, 1, constant_values=False)
+    shifted = lambda dx, dy: padded[1 + dx:1 + dx + height, 1 + dy:1 + dy + width]
+
+    masks = np.zeros(int_map.shape, dtype=np.uint8)
+    for bit, (dx, dy) in enumerate(MOVES_8[:connectivity]):
+        valid = free & shifted(dx, dy)
+        if dx and dy:
+            if corner_cutting == 'never':
+                valid &= shifted(dx, 0) & shifted(0, dy)
+            elif corner_cutting == 'one_side':
+                valid &= shifted(dx, 0) | shifted(0, dy)
+        masks |= valid.astype(np.uint8) << bit
+    return masks
+
+@functools.lru_cache(maxsize=None)
+def move_table(width):
+    '''
+    Lists the moves of every possible neighbour mask as
+    (flat index offset, (dx, dy), step length) tuples.
+    '''
+    moves = [
+        (dx * width + dy, (dx, dy), math.sqrt(2) if dx and dy else 1)
+        for dx, dy in MOVES_8
+    ]
+    return [
+        tuple(move for bit, move in enumerate(moves) if mask >> bit & 1)
+        for mask in range(256)
+    ]
+
+def reconstruct_path(parent, index, width, as_array=False):
+    '''
+    Walks the parent array from the given cell back to the start. The path
+    is written into a buffer allocated once its length is known, and is
+    returned as a list of (x, y) tuples or, with as_array, an (n, 2) array.
+    '''
+    links = memoryview(parent)
+    length = 0
+    i = index
+    while i != -1:
+        length += 1
+        i = links[i]
+
+    indices = np.empty(length, dtype=np.int64)
+    buffer = memoryview(indices)
+    i = index
+    for k in range(length - 1, -1, -1):
+        buffer[k] = i
+        i = links[i]
+
+    path = np.stack(np.divmod(indices, width), axis=1)
+    if as_array:
+        return path
+    return list(map(tuple, path.tolist()))
+
+def path_cost(int_map, path):
+    '''
+    Total cost of moving along the given path, paying for every cell entered.
+    Diagonal steps pay sqrt(2) times the cost of the cell they enter.
+    '''
+    if path is None:
+        return None
+    cells = np.array(path, dtype=np.int64).reshape(-1, 2)
+    costs = int_map[cells[1:, 0], cells[1:, 1]]
+    diagonal = np.all(cells[1:] != cells[:-1], axis=1)
+    if not diagonal.any():
+        return int(costs.sum())
+    return float(np.where(diagonal, costs * math.sqrt(2), costs).sum())
+
+def grid_a_star(int_map, start, goal, heuristic=None, connectivity=4, corner_cutting='never', graph=None,
+                as_array=False):
+    """
+    A* search specialised for grid maps such as Map_Obj.int_map.
+
+    Cells are addressed by their row-major flat index (x * width + y), and all
+    search state lives in preallocated arrays instead of per-node objects.
+
+    Input:
+        int_map:            2D array of cell costs, Map_Obj.OBSTACLE_CELL marks walls
+        start:              Start position (x, y)
+        goal:               Goal position (x, y)
+
+        (Optional)
+        heuristic:          'manhattan', 'euclidean', 'octile', 'zero', an
+                            array of heuristic values with the same shape as
+                            int_map such as HeuristicTable.array, or a
+                            function of the form (int_map, goal) -> array,
+                            such as part_3.samf_chase_array. Defaults to
+                            'manhattan', or 'octile' with 8-connectivity,
+                            where 'manhattan' is refused since it
+                            overestimates diagonal paths.
+        connectivity:       4 or 8, whether diagonal moves are allowed. A
+                            diagonal move costs sqrt(2) times the cell entered.
+        corner_cutting:     Rule for diagonal moves past obstacles, one of
+                            'never', 'one_side' and 'always'
+        graph:              Compiled CSRGraph of the map (see adjacency.py)
+                            to search instead, for maps searched repeatedly.
+                            Its movement rules replace connectivity and
+                            corner_cutting, although connectivity still
+                            picks the default heuristic.
+        as_array:           Return the path as an (n, 2) integer array instead
+
+    Returns:
+        A list of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        representing a path from start to goal, or None if there is none.
+    """
+    height, width = int_map.shape
+    n = height * width
+    costs = int_map.ravel()
+    h = heuristic_array(int_map, goal, resolve_heuristic(heuristic, connectivity))
+    if graph is not None:
+        if graph.shape != int_map.shape:
+            raise ValueError(f"Graph of shape {graph.shape} does not match map of shape {int_map.shape}.")
+        offsets, neighbours, edge_costs = graph.views()
+    else:
+        # Valid moves per cell, so expansions need no bounds or obstacle checks
+        masks = neighbour_masks(int_map, connectivity, corner_cutting).ravel().tolist()
+        moves = move_table(width)
+
+    # Search state, indexed by cell. The loop below works on memoryviews of
+    # the arrays, which read and write plain Python numbers much faster.
+    parent_array = np.full(n, -1, dtype=np.int64)
+    g = memoryview(np.full(n, np.inf))
+    f = memoryview(np.full(n, np.inf))
+    parent = memoryview(parent_array)
+    closed = memoryview(np.zeros(n, dtype=bool))
+    h = memoryview(h)
+    costs = memoryview(np.ascontiguousarray(costs))
+
+    s = to_index(start, width)
+    t = to_index(goal, width)
+    g[s] = 0
+    f[s] = h[s]
+    open_ = [(f[s], s)]
+
+    while open_:
+        f_u, u = heapq.heappop(open_)
+        # Skip stale entries left behind by improved paths
+        if closed[u] or f_u > f[u]:
+            continue
+        closed[u] = True
+
+        if u == t:
+            return reconstruct_path(parent_array, u, width, as_array)
+
+        g_u = g[u]
+        if graph is not None:
+            for i in range(offsets[u], offsets[u + 1]):
+                v = neighbours[i]
+                if closed[v]:
+                    continue
+
+                g_v = g_u + edge_costs[i]
+                if g_v < g[v]:
+                    g[v] = g_v
+                    f[v] = g_v + h[v]
+                    parent[v] = u
+                    heapq.heappush(open_, (f[v], v))
+            continue
+
+        for offset, _, step in moves[masks[u]]:
+            v = u + offset
+            if closed[v]:
+                continue
+
+            g_v = g_u + costs[v] * step
+            if g_v < g[v]:
+                g[v] = g_v
+                f[v] = g_v + h[v]
+                parent[v] = u
+                heapq.heappush(open_, (f[v], v))
+
+    return None
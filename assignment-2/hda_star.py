@@ -0,0 +1,354 @@
+import heapq
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+
+from adjacency import compile_map, CSRGraph
+from grid_a_star import grid_a_star, path_cost, resolve_heuristic, to_index, to_pos
+from Map import Map_Obj
+from search_stats import ParallelStats
+
+# Seconds an idle worker waits for messages before checking its inbox again
+IDLE_WAIT = 0.005
+
+
+def owner(index, workers):
+    '''
+    Worker owning the cell with the given flat index. Knuth's multiplicative
+    hash spreads neighbouring cells over the workers.
+    '''
+    return ((index * 2654435761) & 0xFFFFFFFF) % workers
+
+def _cell_heuristic(kind, width, goal):
+    gx, gy = divmod(goal, width)
+    if kind == 'manhattan':
+        def h(index):
+            x, y = divmod(index, width)
+            return abs(gx - x) + abs(gy - y)
+    elif kind == 'octile':
+        def h(index):
+            x, y = divmod(index, width)
+            dx, dy = abs(gx - x), abs(gy - y)
+            return dx + dy + (math.sqrt(2) - 2) * min(dx, dy)
+    elif kind == 'zero':
+        def h(index):
+            return 0
+    else:
+        raise ValueError(f"Unknown heuristic '{kind}'.")
+    return h
+
+def _worker(rank, workers, handle, start, goal, heuristic, batch_size, inboxes, results, control):
+    '''
+    Runs the search of one worker, reporting any error on the results queue
+    as ('error', rank, traceback) before the worker exits.
+    '''
+    try:
+        _search(rank, workers, handle, start, goal, heuristic, batch_size, inboxes, results, control)
+    except BaseException:
+        # The caller raises the error, so leave without printing it again
+        results.put(('error', rank, traceback.format_exc()))
+        sys.exit(1)
+
+def _search(rank, workers, handle, start, goal, heuristic, batch_size, inboxes, results, control):
+    '''
+    Searches the cells owned by this worker. Successors owned by other
+    workers are sent to them in batches of (cell, g, parent) triples.
+
+    Messages to a worker are ('batch', items), ('parent', cell) which is
+    answered on the results queue, and ('stop', None).
+    '''
+    sent, received, idle, incumbent = control
+    graph = CSRGraph.attach(handle)
+    offsets, neighbours, costs = graph.views()
+    h = _cell_heuristic(heuristic, graph.shape[1], goal)
+
+    g = {}
+    parent = {}
+    open_ = []
+    inbox = inboxes[rank]
+    outboxes = [[] for _ in range(workers)]
+    expansions = 0
+    messages = 0
+
+    def relax(v, g_v, u):
+        if g_v < g.get(v, math.inf):
+            g[v] = g_v
+            parent[v] = u
+            heapq.heappush(open_, (g_v + h(v), g_v, v))
+            # Only the owner of the goal ever lowers the incumbent
+            if v == goal and g_v < incumbent.value:
+                incumbent.value = g_v
+
+    def flush():
+        nonlocal messages
+        for o, out in enumerate(outboxes):
+            if out:
+                # Counted before sending, so a batch in flight is never missed
+                sent[rank] += 1
+                messages += len(out)
+                inboxes[o].put(('batch', out))
+                outboxes[o] = []
+
+    def handle_message(message):
+        kind, body = message
+        if kind == 'batch':
+            idle[rank] = 0
+            received[rank] += 1
+            for v, g_v, u in body:
+                relax(v, g_v, u)
+        elif kind == 'parent':
+            results.put(('parent', parent[body]))
+        elif kind == 'stop':
+            results.put(('stats', rank, expansions, messages))
+            graph.close()
+            return False
+        return True
+
+    if owner(start, workers) == rank:
+        relax(start, 0, -1)
+
+    while True:
+        # Take in everything which has arrived, without waiting
+        try:
+            while True:
+                if not handle_message(inbox.get_nowait()):
+                    return
+        except queue.Empty:
+            pass
+
+        # Expand a round of nodes, then pass the successors on
+        for _ in range(batch_size):
+            if not open_:
+                break
+            f_u, g_u, u = heapq.heappop(open_)
+            if g_u > g[u]:
+                continue
+            # Nothing left here can lead to a cheaper path than the incumbent
+            if f_u >= incumbent.value:
+                open_.clear()
+                break
+            expansions += 1
+            for i in range(offsets[u], offsets[u + 1]):
+                v = neighbours[i]
+                g_v = g_u + costs[i]
+                o = owner(v, workers)
+                if o == rank:
+                    relax(v, g_v, u)
+                else:
+                    outboxes[o].append((v, g_v, u))
+        flush()
+
+        if not open_:
+            idle[rank] = 1
+            try:
+                if not handle_message(inbox.get(timeout=IDLE_WAIT)):
+                    return
+            except queue.Empty:
+                pass
+
+def hda_star(int_map, start, goal, workers=None, heuristic=None, connectivity=4, corner_cutting='never',
+             batch_size=256, timeout=None, stats=None):
+    """
+    Hash distributed A* (HDA*), spreading one search over worker processes.
+
+    Every cell is owned by one worker, chosen by hashing its index. Each
+    worker keeps the frontier and costs of its own cells, expands them in
+    rounds and sends the successors owned by others in batches. The
+    compiled map lives in shared memory, which every worker attaches to
+    instead of receiving a copy.
+
+    The owner of the goal keeps the cost of the best path to it found so far
+    in shared memory, and workers drop every node which cannot beat it. The
+    search is over once every worker is idle and every batch sent has been
+    received, which the calling process checks on two consecutive identical
+    snapshots of the counters of all workers. The path returned is optimal
+    for a consistent heuristic, as in grid_a_star.
+
+    Input:
+        int_map:            2D array of cell costs, Map_Obj.OBSTACLE_CELL marks walls
+        start:              Start position (x, y)
+        goal:               Goal position (x, y)
+
+        (Optional)
+        workers:            Number of worker processes, defaults to the CPU count
+        heuristic:          'manhattan', 'octile' or 'zero', evaluated per cell
+                            by the workers. Defaults to 'manhattan', or
+                            'octile' with 8-connectivity, as in grid_a_star
+        connectivity:       4 or 8, whether diagonal moves are allowed
+        corner_cutting:     Rule for diagonal moves past obstacles, one of
+                            'never', 'one_side' and 'always'
+        batch_size:         Nodes expanded per round, and so the largest
+                            number of successors sent in one batch
+        timeout:            Seconds after which the search is abandoned with
+                            a TimeoutError. No limit by default.
+        stats:              ParallelStats instance to record expansions per
+                            worker and message counts in
+
+    Returns:
+        A list of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        representing a path from start to goal, or None if there is none.
+
+    Raises:
+        ValueError for invalid arguments, before any worker is started
+        RuntimeError if a worker fails, with the worker's traceback
+        TimeoutError if the search takes longer than timeout
+    """
+    workers = os.cpu_count() if workers is None else workers
+    if workers < 1 or batch_size < 1:
+        raise ValueError('There must be at least one worker and a batch size of at least one.')
+    height, width = int_map.shape
+    for name, pos in (('start', tuple(int(c) for c in start)), ('goal', tuple(int(c) for c in goal))):
+        if not (0 <= pos[0] < height and 0 <= pos[1] < width):
+            raise ValueError(f"The {name} {pos} is outside the map.")
+        if int_map[pos] == Map_Obj.OBSTACLE_CELL:
+            raise ValueError(f"The {name} {pos} is an obstacle.")
+    heuristic = resolve_heuristic(heuristic, connectivity)
+    s = to_index(start, width)
+    t = to_index(goal, width)
+    # Fails here rather than in every worker on an unknown heuristic
+    _cell_heuristic(heuristic, width, t)
+    if s == t:
+        return [tuple(start)]
+
+    # Also checks connectivity and corner_cutting
+    graph = compile_map(int_map, connectivity, corner_cutting).share()
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    sent = context.RawArray('q', workers)
+    received = context.RawArray('q', workers)
+    idle = context.RawArray('b', workers)
+    incumbent = context.RawValue('d', math.inf)
+
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(rank, workers, graph.handle, s, t, heuristic, batch_size, inboxes, results,
+                  (sent, received, idle, incumbent)),
+            daemon=True,
+        )
+        for rank in range(workers)
+    ]
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    stopping = False
+
+    def check_workers():
+        '''
+        Raises if the search ran out of time or a worker exited early.
+        '''
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError(f"hda_star did not finish within {timeout} s.")
+        for rank, process in enumerate(processes):
+            exitcode = process.exitcode
+            if exitcode is not None and (exitcode != 0 or not stopping):
+                errors = []
+                try:
+                    while True:
+                        message = results.get(timeout=IDLE_WAIT)
+                        if message[0] == 'error':
+                            errors.append(message[2])
+                except queue.Empty:
+                    pass
+                details = f":\n{errors[0]}" if errors else '.'
+                raise RuntimeError(f"Worker {rank} of hda_star exited with code {exitcode}{details}")
+
+    def next_result():
+        while True:
+            try:
+                return results.get(timeout=IDLE_WAIT)
+            except queue.Empty:
+                check_workers()
+
+    try:
+        for process in processes:
+            process.start()
+
+        # Wait until no worker has work left and no batch is in flight
+        checks = 0
+        previous = None
+        while True:
+            time.sleep(IDLE_WAIT / 5)
+            check_workers()
+            checks += 1
+            snapshot = (list(idle), list(sent), list(received))
+            if all(snapshot[0]) and sum(snapshot[1]) == sum(snapshot[2]) and snapshot == previous:
+                break
+            previous = snapshot
+
+        # Follow the parents back from the goal, asking each owner in turn
+        path = None
+        if incumbent.value < math.inf:
+            path = [t]
+            while path[-1] != s:
+                inboxes[owner(path[-1], workers)].put(('parent', path[-1]))
+                _, u = next_result()
+                path.append(u)
+            path.reverse()
+
+        stopping = True
+        for inbox in inboxes:
+            inbox.put(('stop', None))
+        worker_expansions = [0] * workers
+        messages = 0
+        for _ in range(workers):
+            _, rank, expansions, worker_messages = next_result()
+            worker_expansions[rank] = expansions
+            messages += worker_messages
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        graph.unlink()
+
+    if stats is not None:
+        stats.worker_expansions = worker_expansions
+        stats.messages = messages
+        stats.batches = sum(sent)
+        stats.termination_checks = checks
+        stats.cost = incumbent.value if path is not None else None
+
+    if path is None:
+        return None
+    return [to_pos(index, width) for index in path]
+
+
+def main():
+    '''
+    Usage: hda_star.py [size] [max_workers]
+    Times hda_star against grid_a_star on a generated random map, for 1, 2,
+    4, ... up to max_workers (default 16) worker processes.
+    '''
+    # Imported here, since the benchmark itself runs searches of other modules
+    from benchmark import make_map
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    int_map, start, goal = make_map('random', size, 0.2, True, 0)
+
+    t = time.perf_counter()
+    expected = path_cost(int_map, grid_a_star(int_map, start, goal))
+    serial_time = time.perf_counter() - t
+    print(f"{size}x{size} random map, {os.cpu_count()} CPUs, grid_a_star {serial_time:.2f} s")
+    print(f"{'workers':>7} {'time':>9} {'speedup':>8} {'expansions':>11} {'balance':>8} {'batches':>8}")
+
+    workers = 1
+    while workers <= max_workers:
+        stats = ParallelStats()
+        t = time.perf_counter()
+        path = hda_star(int_map, start, goal, workers=workers, stats=stats)
+        seconds = time.perf_counter() - t
+        if path_cost(int_map, path) != expected:
+            raise RuntimeError(f"hda_star with {workers} workers did not find an optimal path.")
+        print(f"{workers:>7} {seconds:>7.2f} s {serial_time / seconds:>7.2f}x {stats.expansions:>11} "
+              f"{stats.load_balance:>8.2f} {stats.batches:>8}")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
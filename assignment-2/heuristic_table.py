@@ -0,0 +1,114 @@
+import contextlib
+import io
+import time
+
+from a_star import a_star
+from grid_a_star import heuristic_array
+from Map import Map_Obj
+
+# Runs per search in the timing report of main
+REPEATS = 20
+
+
+class HeuristicTable:
+    """
+    Heuristic values of every cell of a Map_Obj towards its goal, evaluated
+    in one NumPy expression per goal position.
+
+    An instance is a heuristic function of the form (state) -> heuristic
+    value, for use with a_star and the other state based searches, which
+    looks the value up instead of recomputing it for every node. Grid
+    searches take the flat array directly, as the heuristic of grid_a_star.
+
+    By default the table follows the goal as it moves through
+    Map_Obj.move_goal_pos, evaluating the heuristic for the new goal position
+    the first time it is looked up. A goal changed any other way is not
+    noticed.
+
+    Every goal position costs one evaluation over the whole map, so the
+    table only pays off when many values are looked up per goal position,
+    as in repeated or grid searches. A single a_star search on the task
+    maps is faster with the function heuristics of part_1_and_2 and part_3.
+    """
+    def __init__(self, map_obj, kind='manhattan', follow_goal=True):
+        '''
+        kind is any heuristic accepted by grid_a_star.heuristic_array: the
+        name of a heuristic or a function (int_map, goal) -> array.
+        '''
+        self.map_obj = map_obj
+        self.int_map = map_obj.int_map
+        self.kind = kind
+        self.goal = None
+        self.width = self.int_map.shape[1]
+        self._array = None
+        self._values = None
+        self.evaluations = 0
+        if follow_goal:
+            map_obj.add_goal_listener(self._on_goal_moved)
+
+    def _on_goal_moved(self, old_pos, new_pos):
+        self._array = None
+        self._values = None
+
+    def _evaluate(self):
+        self.goal = tuple(self.map_obj.get_goal_pos())
+        self._array = heuristic_array(self.int_map, self.goal, self.kind)
+        # Indexing a memoryview gives Python floats, far faster than the array
+        self._values = memoryview(self._array)
+        self.evaluations += 1
+
+    @property
+    def array(self):
+        '''
+        Heuristic values as a flat array indexed by cell index.
+        '''
+        if self._array is None:
+            self._evaluate()
+        return self._array
+
+    def __call__(self, state):
+        if self._values is None:
+            self._evaluate()
+        return self._values[state[1] * self.width + state[2]]
+
+    def close(self):
+        '''
+        Stops following the goal of the map.
+        '''
+        if self._on_goal_moved in self.map_obj.goal_listeners:
+            self.map_obj.remove_goal_listener(self._on_goal_moved)
+
+
+def main():
+    # Imported here, since part_1_and_2 and part_3 build on this module
+    import part_3
+    from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+
+    print(f"{'task':>4} {'function':>10} {'table':>10} {'cost':>5}")
+    for task in range(1, 6):
+        # Task 5 chases the moving goal, with the goal tick in its goal test
+        function = part_3.samf_chase_heuristic if task == 5 else manhattan
+        kind = part_3.samf_chase_array if task == 5 else 'manhattan'
+        predicate = part_3.goal_predicate if task == 5 else goal_predicate
+
+        # Best of several runs, since a single search takes a few milliseconds
+        timings, costs = [], []
+        for make_heuristic in (lambda map_obj: function, lambda map_obj: HeuristicTable(map_obj, kind)):
+            best = float('inf')
+            for _ in range(REPEATS):
+                map_obj = Map_Obj(task=task)
+                heuristic_func = make_heuristic(map_obj)
+                t = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    path = a_star((map_obj, *map_obj.get_start_pos()), heuristic_func, successors_gen, predicate,
+                                  cost_func=cost_func)
+                best = min(best, time.perf_counter() - t)
+            timings.append(best)
+            costs.append(sum(map_obj.get_cell_value(pos) for pos in path[1:]))
+
+        if costs[0] != costs[1]:
+            raise RuntimeError(f"The heuristic table changed the path cost of task {task}.")
+        print(f"{task:>4} {timings[0] * 1000:>7.2f} ms {timings[1] * 1000:>7.2f} ms {costs[0]:>5}")
+
+if __name__ == "__main__":
+    main()
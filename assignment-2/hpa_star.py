@@ -0,0 +1,396 @@
+import heapq
+import os
+import pickle
+import time
+
+import numpy as np
+
+from distance_field import map_hash
+from grid_a_star import MOVES, grid_a_star, to_index, to_pos
+from Map import MAP_DIR, Map_Obj
+
+# Entrances at least this wide get a transition at both ends instead of one
+# in the middle
+WIDE_ENTRANCE = 6
+
+
+class HierarchicalMap:
+    """
+    Hierarchical abstraction (HPA*) of a grid map.
+
+    The map is partitioned into square clusters. Wherever two neighbouring
+    clusters share a stretch of free border cells, transitions are placed
+    across the border, and the cells on either side become nodes of an
+    abstract graph. Inside every cluster, the costs between its nodes are
+    precomputed, so a query searches the small abstract graph and only
+    refines the abstract edges on the resulting route back into cells.
+
+    Paths are near-optimal: they are optimal with respect to the abstract
+    graph, which only crosses cluster borders at transitions.
+    """
+    def __init__(self, int_map, cluster_size=10):
+        self.int_map = int_map.copy()
+        self.cluster_size = cluster_size
+        self.height, self.width = int_map.shape
+        self.costs = self.int_map.ravel()
+        self.n_clusters = (
+            -(-self.height // cluster_size),
+            -(-self.width // cluster_size)
+        )
+
+        # Maps from cluster to the digest of its cells
+        self.cluster_hashes = {}
+        # Maps from border to the (cell, cell) transitions across it
+        self.transitions = {}
+        # Maps from cluster to {node: {node: cost}} within that cluster
+        self.intra = {}
+        # Maps from node to {node: cost} across cluster borders
+        self.inter = {}
+
+        clusters = list(self._clusters())
+        self._rebuild(clusters)
+
+    # Public functions
+    def update(self, int_map):
+        '''
+        Brings the abstraction up to date with a changed map, rebuilding only
+        the clusters whose cells changed (and the borders around them).
+        Returns the changed clusters.
+        '''
+        if int_map.shape != self.int_map.shape:
+            raise ValueError('The map changed shape, build a new abstraction instead.')
+
+        changed = [
+            cluster for cluster in self._clusters()
+            if self._cluster_hash(int_map, cluster) != self.cluster_hashes[cluster]
+        ]
+        if changed:
+            self.int_map[...] = int_map
+            self._rebuild(changed)
+        return changed
+
+    def find_path(self, start, goal):
+        '''
+        Returns a path from start to goal as a list of (x, y) positions, or
+        None if there is none.
+        '''
+        s = to_index(start, self.width)
+        t = to_index(goal, self.width)
+        if self.costs[s] == Map_Obj.OBSTACLE_CELL or self.costs[t] == Map_Obj.OBSTACLE_CELL:
+            return None
+        if s == t:
+            return [to_pos(s, self.width)]
+
+        # Temporarily connect start and goal to the nodes of their clusters
+        start_cluster = self._cluster_of(s)
+        goal_cluster = self._cluster_of(t)
+        start_nodes = self._nodes(start_cluster)
+        goal_nodes = self._nodes(goal_cluster)
+
+        dist, _ = self._dijkstra(s, start_cluster)
+        start_edges = {v: dist[v] for v in start_nodes if v in dist}
+        dist, _ = self._dijkstra(t, goal_cluster, reverse=True)
+        goal_edges = {v: dist[v] for v in goal_nodes if v in dist}
+        if start_cluster == goal_cluster:
+            dist, _ = self._dijkstra(s, start_cluster, target=t)
+            if t in dist:
+                start_edges[t] = dist[t]
+
+        route = self._abstract_search(s, t, start_edges, goal_edges)
+        if route is None:
+            return None
+        return self._refine(route)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump({
+                'cluster_size': self.cluster_size,
+                'int_map': self.int_map,
+                'cluster_hashes': self.cluster_hashes,
+                'transitions': self.transitions,
+                'intra': self.intra,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            stored = pickle.load(f)
+        hmap = cls.__new__(cls)
+        hmap.cluster_size = stored['cluster_size']
+        hmap.int_map = stored['int_map']
+        hmap.height, hmap.width = hmap.int_map.shape
+        hmap.costs = hmap.int_map.ravel()
+        hmap.n_clusters = (
+            -(-hmap.height // hmap.cluster_size),
+            -(-hmap.width // hmap.cluster_size)
+        )
+        hmap.cluster_hashes = stored['cluster_hashes']
+        hmap.transitions = stored['transitions']
+        hmap.intra = stored['intra']
+        hmap._build_inter()
+        return hmap
+
+    @classmethod
+    def load_or_build(cls, csv_path, int_map, cluster_size=10):
+        '''
+        Loads the abstraction stored next to the map file and updates the
+        clusters which changed since, or builds it from scratch. The result
+        is stored again whenever anything was rebuilt.
+        '''
+        hmap_path = os.path.splitext(csv_path)[0] + '.hpa.pkl'
+        hmap = None
+        if os.path.exists(hmap_path):
+            hmap = cls.load(hmap_path)
+            if hmap.cluster_size != cluster_size or hmap.int_map.shape != int_map.shape:
+                hmap = None
+
+        if hmap is None:
+            hmap = cls(int_map, cluster_size)
+        elif not hmap.update(int_map):
+            return hmap
+        hmap.save(hmap_path)
+        return hmap
+
+    # Private functions
+    def _clusters(self):
+        for i in range(self.n_clusters[0]):
+            for j in range(self.n_clusters[1]):
+                yield (i, j)
+
+    def _cluster_of(self, u):
+        x, y = divmod(u, self.width)
+        return (x // self.cluster_size, y // self.cluster_size)
+
+    def _bounds(self, cluster):
+        i, j = cluster
+        cs = self.cluster_size
+        return (i * cs, min((i + 1) * cs, self.height), j * cs, min((j + 1) * cs, self.width))
+
+    def _cluster_hash(self, int_map, cluster):
+        x0, x1, y0, y1 = self._bounds(cluster)
+        return map_hash(int_map[x0:x1, y0:y1])
+
+    def _borders(self, cluster):
+        '''
+        Borders shared with the neighbouring clusters, as (cluster, cluster)
+        pairs ordered along x and y.
+        '''
+        i, j = cluster
+        borders = []
+        if i > 0:
+            borders.append(((i - 1, j), cluster))
+        if i + 1 < self.n_clusters[0]:
+            borders.append((cluster, (i + 1, j)))
+        if j > 0:
+            borders.append(((i, j - 1), cluster))
+        if j + 1 < self.n_clusters[1]:
+            borders.append((cluster, (i, j + 1)))
+        return borders
+
+    def _nodes(self, cluster):
+        return self.intra[cluster].keys()
+
+    def _rebuild(self, clusters):
+        for cluster in clusters:
+            self.cluster_hashes[cluster] = self._cluster_hash(self.int_map, cluster)
+
+        # Borders of changed clusters move the nodes of their neighbours too
+        borders = {border for cluster in clusters for border in self._borders(cluster)}
+        for border in borders:
+            self.transitions[border] = self._find_transitions(border)
+        affected = set(clusters) | {cluster for border in borders for cluster in border}
+
+        for cluster in affected:
+            nodes = set()
+            for a, b in self._borders(cluster):
+                for u, v in self.transitions[(a, b)]:
+                    nodes.add(u if a == cluster else v)
+            self.intra[cluster] = {}
+            for u in sorted(nodes):
+                dist, _ = self._dijkstra(u, cluster)
+                self.intra[cluster][u] = {v: dist[v] for v in nodes if v != u and v in dist}
+
+        self._build_inter()
+
+    def _build_inter(self):
+        self.inter = {}
+        for transitions in self.transitions.values():
+            for u, v in transitions:
+                self.inter.setdefault(u, {})[v] = self.costs[v]
+                self.inter.setdefault(v, {})[u] = self.costs[u]
+
+    def _find_transitions(self, border):
+        '''
+        Places transitions along every stretch of border where the cells on
+        both sides are free.
+        '''
+        a, b = border
+        ax0, ax1, ay0, ay1 = self._bounds(a)
+        if a[0] != b[0]:
+            # Border along y, between the last row of a and the first row of b
+            pairs = [((ax1 - 1, y), (ax1, y)) for y in range(ay0, ay1)]
+        else:
+            # Border along x, between the last column of a and the first column of b
+            pairs = [((x, ay1 - 1), (x, ay1)) for x in range(ax0, ax1)]
+
+        transitions = []
+        run = []
+        for p, q in pairs + [(None, None)]:
+            if p is not None and self.int_map[p] != Map_Obj.OBSTACLE_CELL and self.int_map[q] != Map_Obj.OBSTACLE_CELL:
+                run.append((to_index(p, self.width), to_index(q, self.width)))
+                continue
+            if len(run) >= WIDE_ENTRANCE:
+                transitions.extend((run[0], run[-1]))
+            elif run:
+                transitions.append(run[len(run) // 2])
+            run = []
+        return transitions
+
+    def _dijkstra(self, source, cluster, target=None, reverse=False):
+        '''
+        Dijkstra's algorithm restricted to the cells of the given cluster.
+        Searching in reverse gives the cost of reaching source from each cell.
+        Returns the distance and parent dictionaries.
+        '''
+        x0, x1, y0, y1 = self._bounds(cluster)
+        dist = {source: 0}
+        parent = {source: None}
+        open_ = [(0, source)]
+
+        while open_:
+            d_u, u = heapq.heappop(open_)
+            if d_u > dist[u]:
+                continue
+            if u == target:
+                break
+
+            x, y = divmod(u, self.width)
+            for dx, dy in MOVES:
+                x_ = x + dx
+                y_ = y + dy
+                if (x_ < x0) or (x_ >= x1) or (y_ < y0) or (y_ >= y1):
+                    continue
+                v = x_ * self.width + y_
+                if self.costs[v] == Map_Obj.OBSTACLE_CELL:
+                    continue
+                d_v = d_u + (self.costs[u] if reverse else self.costs[v])
+                if d_v < dist.get(v, np.inf):
+                    dist[v] = d_v
+                    parent[v] = u
+                    heapq.heappush(open_, (d_v, v))
+
+        return dist, parent
+
+    def _abstract_search(self, s, t, start_edges, goal_edges):
+        '''
+        A* over the abstract graph extended with the start and goal cells.
+        Returns the route as a list of cell indices.
+        '''
+        tx, ty = divmod(t, self.width)
+        def h(u):
+            x, y = divmod(u, self.width)
+            return abs(tx - x) + abs(ty - y)
+
+        g = {s: 0}
+        parent = {s: None}
+        closed = set()
+        open_ = [(h(s), s)]
+
+        while open_:
+            _, u = heapq.heappop(open_)
+            if u in closed:
+                continue
+            closed.add(u)
+
+            if u == t:
+                route = []
+                while u is not None:
+                    route.append(u)
+                    u = parent[u]
+                route.reverse()
+                return route
+
+            edges = list(self.intra[self._cluster_of(u)].get(u, {}).items())
+            edges += self.inter.get(u, {}).items()
+            if u == s:
+                edges += start_edges.items()
+            if u in goal_edges:
+                edges.append((t, goal_edges[u]))
+
+            for v, cost in edges:
+                g_v = g[u] + cost
+                if v not in closed and g_v < g.get(v, np.inf):
+                    g[v] = g_v
+                    parent[v] = u
+                    heapq.heappush(open_, (g_v + h(v), v))
+
+        return None
+
+    def _refine(self, route):
+        '''
+        Turns an abstract route into a cell path. Transitions connect
+        neighbouring cells, every other edge lies within one cluster.
+        '''
+        path = [route[0]]
+        for u, v in zip(route, route[1:]):
+            if self._cluster_of(u) != self._cluster_of(v):
+                path.append(v)
+                continue
+            _, parent = self._dijkstra(u, self._cluster_of(u), target=v)
+            segment = []
+            while v != u:
+                segment.append(v)
+                v = parent[v]
+            path.extend(reversed(segment))
+        return [to_pos(u, self.width) for u in path]
+
+
+def hierarchical_map(map_obj, cluster_size=10):
+    '''
+    Returns the hierarchical abstraction of the map of the given Map_Obj,
+    stored next to the map file.
+    '''
+    csv_path = os.path.join(MAP_DIR, map_obj.path_to_map)
+    return HierarchicalMap.load_or_build(csv_path, map_obj.int_map, cluster_size)
+
+
+def main():
+    '''
+    Compares HPA* against grid_a_star on tasks 1-4 and on a larger random map,
+    with the optimality gap of the HPA* paths.
+    '''
+    rng = np.random.default_rng(0)
+    size = 200
+    random_map = rng.integers(1, 5, (size, size))
+    random_map[rng.random((size, size)) < 0.25] = Map_Obj.OBSTACLE_CELL
+    random_map[0, 0] = random_map[-1, -1] = 1
+
+    cases = []
+    for task in range(1, 5):
+        map_obj = Map_Obj(task=task)
+        cases.append((f"task {task}", map_obj.int_map, map_obj.get_start_pos(), map_obj.get_goal_pos()))
+    cases.append((f"random {size}x{size}", random_map, (0, 0), (size - 1, size - 1)))
+
+    print(f"{'map':<16} {'build (ms)':>10} {'hpa (ms)':>9} {'a_star (ms)':>11} {'hpa cost':>9} {'cost':>6} {'gap':>6}")
+    for name, int_map, start, goal in cases:
+        path_cost = lambda path: sum(int_map[pos] for pos in path[1:]) if path else None
+
+        t = time.perf_counter()
+        hmap = HierarchicalMap(int_map, cluster_size=10 if int_map.size < 10000 else 25)
+        build = time.perf_counter() - t
+
+        t = time.perf_counter()
+        hpa_path = hmap.find_path(start, goal)
+        hpa = time.perf_counter() - t
+
+        t = time.perf_counter()
+        path = grid_a_star(int_map, start, goal)
+        flat = time.perf_counter() - t
+
+        # How much more expensive the HPA* path is than the optimal one
+        gap = f"{path_cost(hpa_path) / path_cost(path) - 1:.1%}" if path else '-'
+        print(f"{name:<16} {build * 1000:>10.1f} {hpa * 1000:>9.2f} {flat * 1000:>11.2f} "
+              f"{path_cost(hpa_path)!s:>9} {path_cost(path)!s:>6} {gap:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import time
+
+from Map import Map_Obj
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+
+
+# Number of distinct cut off f-values remembered per iteration, the lowest ones
+CUTOFF_HISTOGRAM_SIZE = 256
+
+
+def bounded_depth_first(start_state, heuristic_func, successors_gen, goal_predicate, cost_func, threshold, table,
+                        max_nodes):
+    '''
+    One iteration of IDA*: a depth first search from the start state which
+    cuts off every path whose f-value exceeds threshold. The transposition
+    table maps states to the cheapest g-value they were reached with in this
+    iteration, and holds at most max_nodes states, forgetting the oldest.
+
+    Goals found within the threshold tighten it to their cost, branch and
+    bound style, so the search ends with the cheapest path within threshold.
+
+    Returns the cheapest path found as a list of states (None if there is
+    none), the number of states expanded and a histogram of the lowest f-values
+    cut off, as {f-value: count}.
+    '''
+    path = [start_state]
+    costs = [0]
+    on_path = {start_state}
+    branches = [iter(successors_gen(start_state))]
+    best_path, best_cost = None, float('inf')
+    expanded = 1
+    cutoffs = {}
+
+    while branches:
+        v = next(branches[-1], None)
+        if v is None:
+            branches.pop()
+            costs.pop()
+            on_path.discard(path.pop())
+            continue
+
+        g_v = costs[-1] + cost_func(path[-1], v)
+        if g_v >= best_cost:
+            continue
+        f_v = g_v + heuristic_func(v)
+        if f_v > threshold:
+            if f_v in cutoffs or len(cutoffs) < CUTOFF_HISTOGRAM_SIZE:
+                cutoffs[f_v] = cutoffs.get(f_v, 0) + 1
+            elif f_v < max(cutoffs):
+                del cutoffs[max(cutoffs)]
+                cutoffs[f_v] = 1
+            continue
+        # Skip cycles, and states already explored from a cheaper or equal cost
+        if v in on_path or table.get(v, float('inf')) <= g_v:
+            continue
+
+        table.pop(v, None)
+        if len(table) >= max_nodes:
+            del table[next(iter(table))]
+        table[v] = g_v
+
+        if goal_predicate(v):
+            best_path, best_cost = path + [v], g_v
+            threshold = min(threshold, g_v)
+            continue
+
+        path.append(v)
+        costs.append(g_v)
+        on_path.add(v)
+        branches.append(iter(successors_gen(v)))
+        expanded += 1
+
+    return best_path, expanded, cutoffs
+
+def next_threshold(cutoffs, expanded):
+    '''
+    Picks the next threshold from the histogram of cut off f-values, high
+    enough to let in about as many new states as the last iteration expanded,
+    so that the work roughly doubles per iteration.
+    '''
+    seen = 0
+    for f in sorted(cutoffs):
+        seen += cutoffs[f]
+        if seen >= expanded:
+            return f
+    return max(cutoffs)
+
+def ida_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=lambda *_: 1,
+             max_nodes=100000, stats=None):
+    """
+    Iterative deepening A* with a bounded transposition table, for searches
+    where a_star would run out of memory.
+
+    Each iteration is a depth first search bounded by an f-value threshold.
+    Rather than raising the threshold to the lowest f-value cut off, which
+    takes an iteration per distinct f-value, it is raised far enough to about
+    double the work of the previous iteration. The path found within a
+    threshold may then be more expensive than the threshold, so the search
+    keeps looking for cheaper paths within the iteration, which keeps the
+    result optimal for an admissible heuristic.
+
+    Memory holds the current path, at most max_nodes table entries and a
+    small histogram, no matter how much of the map is explored. A smaller
+    table only means more states are explored again.
+
+    Input:
+        start_state:        Initial state
+        heuristic_func:     Function of the form (state) -> heuristic value
+        successors_gen:     Generator which yields all successors for a given state:
+                                state -> yield successor state
+        goal_predicate:     Predicate to test whether the given state is a goal state:
+                                state -> True or False
+
+        (Optional)
+        cost_func:          Function which returns the cost of a state transition:
+                                from_state, to_state -> cost
+                            Defaults to a cost of one.
+        max_nodes:          Most states kept in the transposition table
+        stats:              SearchStats instance which collects counters and
+                            timings of the search. Disabled by default.
+
+    Returns:
+        A list of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        representing a path from start to end node, or None if there is none.
+    """
+    if max_nodes < 1:
+        raise ValueError('The transposition table must hold at least one state.')
+    if stats is not None:
+        heuristic_func, successors_gen, goal_predicate, _ = stats.instrument(
+            heuristic_func, successors_gen, goal_predicate, None
+        )
+
+    if goal_predicate(start_state):
+        return [start_state[1:]]
+
+    threshold = heuristic_func(start_state)
+    table = {}
+    while True:
+        table.clear()
+        path, expanded, cutoffs = bounded_depth_first(
+            start_state, heuristic_func, successors_gen, goal_predicate, cost_func, threshold, table, max_nodes
+        )
+        if path is not None:
+            return [state[1:] for state in path]
+        if not cutoffs:
+            return None
+        threshold = next_threshold(cutoffs, expanded)
+
+def main():
+    # Imported here, so the search itself does not load the whole benchmark
+    from benchmark import BenchmarkMap, make_map
+    from grid_a_star import grid_a_star, path_cost
+    from search_stats import SearchStats
+
+    print(f"{'task':>4} {'max_nodes':>10} {'cost':>5} {'time':>10}")
+    for task in range(1, 5):
+        for max_nodes in (100, 1000, 100000):
+            map_obj = Map_Obj(task=task)
+            t = time.perf_counter()
+            path = ida_star((map_obj, *map_obj.get_start_pos()), manhattan, successors_gen, goal_predicate,
+                            cost_func=cost_func, max_nodes=max_nodes)
+            cost = sum(map_obj.get_cell_value(pos) for pos in path[1:])
+            print(f"{task:>4} {max_nodes:>10} {cost:>5} {(time.perf_counter() - t) * 1000:>7.1f} ms")
+
+    # Optimal costs on small random maps, with a table too small to hold them
+    seeds = range(15)
+    for seed in seeds:
+        int_map, start, goal = make_map('random', 12, 0.2, True, seed)
+        map_ = BenchmarkMap(int_map, start, goal)
+        path = ida_star((map_, *start), manhattan, successors_gen, goal_predicate, cost_func=cost_func,
+                        max_nodes=50)
+        expected = path_cost(int_map, grid_a_star(int_map, start, goal))
+        if path_cost(int_map, path) != expected:
+            raise RuntimeError(f"ida_star found cost {path_cost(int_map, path)} instead of {expected} "
+                               f"on the random map with seed {seed}.")
+    print(f"{len(seeds)} random 12x12 maps match grid_a_star with max_nodes 50")
+
+    # An unreachable goal, where every reachable state must be ruled out
+    int_map, start, goal = make_map('random', 15, 0.3, True, 1)
+    map_ = BenchmarkMap(int_map, start, goal)
+    stats = SearchStats()
+    t = time.perf_counter()
+    path = ida_star((map_, *start), manhattan, successors_gen, goal_predicate, cost_func=cost_func,
+                    max_nodes=10000, stats=stats)
+    if path is not None or grid_a_star(int_map, start, goal) is not None:
+        raise RuntimeError('The goal of the random 15x15 map with seed 1 should be unreachable.')
+    print(f"Unreachable 15x15 goal ruled out in {time.perf_counter() - t:.2f} s, "
+          f"{stats.expansions} expansions")
+
+if __name__ == "__main__":
+    main()
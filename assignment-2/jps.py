@@ -0,0 +1,295 @@
+import contextlib
+import heapq
+import io
+import sys
+import time
+
+import numpy as np
+
+from a_star import a_star
+from distance_field import compute_distance_field
+from grid_a_star import grid_a_star, path_cost
+from Map import Map_Obj
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+
+
+class JumpPointSearch:
+    """
+    Jump point search on a 4-connected grid.
+
+    Instead of pushing every neighbouring cell, the search jumps in a straight
+    line until it reaches a cell where an optimal path may have to turn (a
+    jump point), and only those cells enter the open list. Moves along x scan
+    sideways along y at every step, moves along y only stop at forced
+    neighbours.
+
+    The weighted variant treats every change of cell cost like an obstacle
+    boundary, so jumps never cross from one cost region into another without
+    stopping. On uniform cost maps both variants behave the same.
+    """
+    def __init__(self, int_map, weighted=None):
+        self.int_map = int_map
+        self.height, self.width = int_map.shape
+        if weighted is None:
+            free = int_map[int_map != Map_Obj.OBSTACLE_CELL]
+            weighted = len(np.unique(free)) > 1
+        self.weighted = weighted
+        self.expansions = 0
+
+    def cost(self, x, y):
+        '''
+        Cost of the given cell, or OBSTACLE_CELL if it is outside the map.
+        '''
+        if (x < 0) or (x >= self.height) or (y < 0) or (y >= self.width):
+            return Map_Obj.OBSTACLE_CELL
+        return self.int_map[x, y]
+
+    def walkable(self, x, y):
+        return self.cost(x, y) != Map_Obj.OBSTACLE_CELL
+
+    def search(self, start, goal):
+        '''
+        Runs A* over jump points. Returns the full cell path from start to
+        goal as a list of (x, y) positions, or None if there is none.
+        '''
+        start = (int(start[0]), int(start[1]))
+        self.goal = (int(goal[0]), int(goal[1]))
+        self.expansions = 0
+
+        g = {start: 0}
+        parent = {start: None}
+        closed = set()
+        open_ = [(self._h(start), start, (0, 0))]
+
+        while open_:
+            _, u, direction = heapq.heappop(open_)
+            if u in closed:
+                continue
+            closed.add(u)
+            self.expansions += 1
+
+            if u == self.goal:
+                return self._expand_path(parent, u)
+
+            for d in self._directions(*u, direction):
+                v = self._jump(*u, *d)
+                if v is None or v in closed:
+                    continue
+                g_v = g[u] + self._segment_cost(u, v)
+                if g_v < g.get(v, np.inf):
+                    g[v] = g_v
+                    parent[v] = u
+                    heapq.heappush(open_, (g_v + self._h(v), v, d))
+
+        return None
+
+    # Private functions
+    def _h(self, pos):
+        return abs(self.goal[0] - pos[0]) + abs(self.goal[1] - pos[1])
+
+    def _directions(self, x, y, direction):
+        '''
+        Pruned set of directions to jump in, given the direction of arrival.
+        '''
+        dx, dy = direction
+        if direction == (0, 0):
+            candidates = ((1, 0), (0, 1), (-1, 0), (0, -1))
+        elif dx != 0:
+            candidates = ((dx, 0), (0, 1), (0, -1))
+        else:
+            candidates = ((0, dy), (1, 0), (-1, 0))
+        return [(dx_, dy_) for dx_, dy_ in candidates if self.walkable(x + dx_, y + dy_)]
+
+    def _region_boundary(self, x, y, dx, dy):
+        '''
+        Whether (x, y), entered by the move (dx, dy), borders another cost
+        region along the direction of travel. Only used by the weighted variant.
+        '''
+        cost = self.cost(x, y)
+        if cost != self.cost(x - dx, y - dy):
+            return True
+        ahead = self.cost(x + dx, y + dy)
+        return ahead != Map_Obj.OBSTACLE_CELL and ahead != cost
+
+    def _forced(self, x, y, dx, dy):
+        '''
+        Whether (x, y), entered by the move (dx, dy), has a forced neighbour
+        on either side of the direction of travel.
+        '''
+        cost = self.cost(x, y)
+        for sx, sy in ((dy, dx), (-dy, -dx)):
+            side = self.cost(x + sx, y + sy)
+            if side == Map_Obj.OBSTACLE_CELL:
+                continue
+            side_behind = self.cost(x + sx - dx, y + sy - dy)
+            if side != side_behind:
+                return True
+            # Stepping sideways earlier is only equivalent within one region
+            if self.weighted and side != cost:
+                return True
+        return self.weighted and self._region_boundary(x, y, dx, dy)
+
+    def _jump(self, x, y, dx, dy):
+        '''
+        Moves from (x, y) in direction (dx, dy) until reaching a jump point.
+        Returns the jump point, or None when running into an obstacle.
+        '''
+        while True:
+            x += dx
+            y += dy
+            if not self.walkable(x, y):
+                return None
+            if (x, y) == self.goal or self._forced(x, y, dx, dy):
+                return (x, y)
+            # Moves along x stop wherever a sideways jump finds a jump point
+            if dx != 0 and (self._jump_y(x, y, 1) or self._jump_y(x, y, -1)):
+                return (x, y)
+
+    def _jump_y(self, x, y, dy):
+        while True:
+            y += dy
+            if not self.walkable(x, y):
+                return False
+            if (x, y) == self.goal or self._forced(x, y, 0, dy):
+                return True
+
+    def _segment_cost(self, u, v):
+        '''
+        Cost of walking the straight segment from u to v, excluding u.
+        '''
+        (x0, y0), (x1, y1) = u, v
+        cells = self.int_map[min(x0, x1):max(x0, x1) + 1, min(y0, y1):max(y0, y1) + 1]
+        return cells.sum() - self.int_map[x0, y0]
+
+    def _expand_path(self, parent, node):
+        '''
+        Fills in the cells between consecutive jump points.
+        '''
+        jump_points = []
+        while node is not None:
+            jump_points.append(node)
+            node = parent[node]
+        jump_points.reverse()
+
+        path = [jump_points[0]]
+        for (x0, y0), (x1, y1) in zip(jump_points, jump_points[1:]):
+            dx = (x1 > x0) - (x1 < x0)
+            dy = (y1 > y0) - (y1 < y0)
+            x, y = x0, y0
+            while (x, y) != (x1, y1):
+                x += dx
+                y += dy
+                path.append((x, y))
+        return path
+
+
+def jump_point_search(map_obj, start=None, goal=None, weighted=None):
+    """
+    Jump point search entry point alongside a_star.
+
+    Input:
+        map_obj:            Map_Obj to search on
+
+        (Optional)
+        start:              Start position, defaults to the map start position
+        goal:               Goal position, defaults to the current goal position
+        weighted:           Whether to stop jumps at cost region boundaries.
+                            Defaults to True whenever the map has more than one
+                            free cell cost.
+
+    Returns:
+        A list of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        representing a path from start to goal, or None if there is none.
+    """
+    start = map_obj.get_start_pos() if start is None else start
+    goal = map_obj.get_goal_pos() if goal is None else goal
+    return JumpPointSearch(map_obj.int_map, weighted=weighted).search(start, goal)
+
+
+def compare_task(task):
+    '''
+    Solves the given task towards its initial goal position with a_star,
+    grid_a_star and jump point search. Returns expansions, path cost and
+    wall-clock time of each.
+    '''
+    map_obj = Map_Obj(task=task)
+    start, goal = map_obj.get_start_pos(), map_obj.get_goal_pos()
+    path_cost = lambda path: sum(map_obj.get_cell_value(pos) for pos in path[1:])
+    results = {}
+
+    expansions = 0
+    def counting_goal_predicate(state):
+        nonlocal expansions
+        expansions += 1
+        return goal_predicate(state)
+
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = a_star((map_obj, *start), manhattan, successors_gen, counting_goal_predicate, cost_func=cost_func)
+    results['a_star'] = (expansions, path_cost(path), time.perf_counter() - t)
+
+    t = time.perf_counter()
+    path = grid_a_star(map_obj.int_map, start, goal)
+    results['grid_a_star'] = (None, path_cost(path), time.perf_counter() - t)
+
+    for weighted in (False, True):
+        jps = JumpPointSearch(map_obj.int_map, weighted=weighted)
+        t = time.perf_counter()
+        path = jps.search(start, goal)
+        name = 'jps_weighted' if weighted else 'jps'
+        results[name] = (jps.expansions, path_cost(path), time.perf_counter() - t)
+
+    return results
+
+def check_against_dijkstra(n_maps, size=30, seed=0):
+    '''
+    Compares the path costs of jump point search, with the variant chosen
+    automatically, to the cost-to-go of a reverse Dijkstra search on random
+    and maze maps, uniform and weighted. Raises RuntimeError on the first
+    path which is invalid or not optimal, returns the number of maps checked.
+    '''
+    # Imported here, since the benchmark itself runs jump point search
+    from benchmark import make_map
+
+    for i in range(n_maps):
+        kind = ('random', 'maze')[i % 2]
+        weighted = bool(i // 2 % 2)
+        int_map, start, goal = make_map(kind, size, 0.3, weighted, seed + i)
+        expected = compute_distance_field(int_map, goal)[start]
+        path = JumpPointSearch(int_map).search(start, goal)
+
+        if path is None:
+            valid = not np.isfinite(expected)
+        else:
+            steps = np.abs(np.diff(np.array(path), axis=0)).sum(axis=1)
+            valid = (
+                tuple(path[0]) == tuple(start) and tuple(path[-1]) == tuple(goal)
+                and (steps == 1).all()
+                and all(int_map[pos] != Map_Obj.OBSTACLE_CELL for pos in path)
+                and path_cost(int_map, path) == expected
+            )
+        if not valid:
+            raise RuntimeError(f"Jump point search failed on the {'weighted ' if weighted else ''}{kind} map "
+                               f"with seed {seed + i}: expected cost {expected}.")
+    return n_maps
+
+def main():
+    '''
+    Usage: jps.py [maps]
+    Compares the searches on all five tasks, then checks jump point search
+    against reverse Dijkstra on the given number of random maps (400 by default).
+    '''
+    print(f"{'task':>4} {'mode':<14} {'expansions':>10} {'cost':>6} {'time (ms)':>10}")
+    for task in range(1, 6):
+        for mode, (expansions, cost, seconds) in compare_task(task).items():
+            expansions = '-' if expansions is None else expansions
+            print(f"{task:>4} {mode:<14} {expansions:>10} {cost:>6} {seconds * 1000:>10.2f}")
+
+    n_maps = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    t = time.perf_counter()
+    check_against_dijkstra(n_maps)
+    print(f"{n_maps} random maps match reverse Dijkstra ({time.perf_counter() - t:.1f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import contextlib
+import io
+import os
+
+import numpy as np
+
+from a_star import a_star
+from distance_field import compute_distance_field, map_hash
+from grid_a_star import to_index
+from Map import MAP_DIR, Map_Obj
+from part_1_and_2 import manhattan, successors_gen, goal_predicate, cost_func
+
+
+def select_landmarks(int_map, k):
+    '''
+    Picks k landmarks by farthest point selection: every new landmark is the
+    reachable cell farthest away from the landmarks chosen so far.
+    Returns the landmark positions and their distance fields.
+    '''
+    free = np.argwhere(int_map != Map_Obj.OBSTACLE_CELL)
+    if len(free) == 0:
+        raise ValueError('The map has no free cells.')
+
+    # Seed with the cell farthest from an arbitrary free cell
+    seed = compute_distance_field(int_map, free[0])
+    candidates = np.where(np.isfinite(seed), seed, -1)
+    landmarks, fields = [], []
+    closest = None
+
+    for _ in range(k):
+        pos = np.unravel_index(np.argmax(candidates), int_map.shape)
+        if candidates[pos] < 0 or (closest is not None and closest[pos] == 0):
+            break
+        field = compute_distance_field(int_map, pos)
+        landmarks.append(pos)
+        fields.append(field)
+        closest = field if closest is None else np.minimum(closest, field)
+        candidates = np.where(np.isfinite(closest), closest, -1)
+
+    return landmarks, fields
+
+
+class LandmarkTable:
+    """
+    Precomputed distances from every cell to a set of landmarks, used for
+    the ALT (A*, landmarks, triangle inequality) heuristic.
+
+    Distance fields give d(x, L). Since moving into a cell costs its value,
+    the reverse distance is d(L, x) = d(x, L) - c(L) + c(x), so a single
+    table bounds the cost from x to the goal g from both sides:
+        d(x, L) - d(g, L)   and   d(L, g) - d(L, x)
+    """
+    def __init__(self, int_map, landmarks, dist):
+        self.int_map = int_map
+        self.landmarks = [tuple(int(c) for c in pos) for pos in landmarks]
+        # Cell major layout, so each lookup reads one contiguous row
+        self.dist = np.ascontiguousarray(dist.reshape(len(landmarks), -1).T)
+        self.costs = int_map.ravel().astype(np.float64)
+        self.width = int_map.shape[1]
+        self._goal = None
+
+    @classmethod
+    def build(cls, int_map, k=8):
+        landmarks, fields = select_landmarks(int_map, k)
+        return cls(int_map, landmarks, np.array(fields))
+
+    @classmethod
+    def load_or_build(cls, csv_path, int_map, k=8):
+        '''
+        Loads the table stored next to the map file, rebuilding and storing
+        it again if the map content or number of landmarks changed.
+        '''
+        table_path = os.path.splitext(csv_path)[0] + '.landmarks.npz'
+        digest = map_hash(int_map)
+        if os.path.exists(table_path):
+            stored = np.load(table_path)
+            if str(stored['map_hash']) == digest and int(stored['k']) == k:
+                landmarks = stored['landmarks']
+                return cls(int_map, landmarks, stored['dist'])
+
+        table = cls.build(int_map, k)
+        np.savez(
+            table_path,
+            map_hash=digest,
+            k=k,
+            landmarks=np.array(table.landmarks),
+            dist=table.dist.T.reshape(len(table.landmarks), *int_map.shape)
+        )
+        return table
+
+    def estimate(self, pos, goal):
+        '''
+        Lower bound on the cost of moving from pos to goal.
+        '''
+        i = to_index(pos, self.width)
+        if self._goal != (goal[0], goal[1]):
+            self._goal = (goal[0], goal[1])
+            self._goal_index = to_index(goal, self.width)
+            self._goal_dist = self.dist[self._goal_index]
+
+        d_x = self.dist[i]
+        d_g = self._goal_dist
+        correction = self.costs[self._goal_index] - self.costs[i]
+        with np.errstate(invalid='ignore'):
+            bounds = np.concatenate((d_x - d_g, d_g - d_x + correction))
+        # Landmarks which reach neither cell give no information
+        bound = np.nanmax(bounds, initial=0)
+        return max(bound, abs(goal[0] - pos[0]) + abs(goal[1] - pos[1]))
+
+    def heuristic(self, state):
+        '''
+        Heuristic function of the form (state) -> heuristic value.
+        '''
+        map_, *pos = state
+        return self.estimate(pos, map_.get_goal_pos())
+
+
+def landmark_heuristic(map_obj, k=8):
+    '''
+    Returns an ALT heuristic function for the map of the given Map_Obj,
+    using the landmark table stored next to the map file.
+    '''
+    csv_path = os.path.join(MAP_DIR, map_obj.path_to_map)
+    return LandmarkTable.load_or_build(csv_path, map_obj.int_map, k).heuristic
+
+def count_expansions(task, heuristic_factory):
+    '''
+    Solves the given task, counting expanded nodes through goal tests.
+    '''
+    map_obj = Map_Obj(task=task)
+    expansions = 0
+
+    def counting_goal_predicate(state):
+        nonlocal expansions
+        expansions += 1
+        return goal_predicate(state)
+
+    start_state = (map_obj, *map_obj.get_start_pos())
+    with contextlib.redirect_stdout(io.StringIO()):
+        a_star(start_state, heuristic_factory(map_obj), successors_gen, counting_goal_predicate, cost_func=cost_func)
+    return expansions
+
+def main():
+    rows = []
+    for task in range(1, 5):
+        rows.append((
+            task,
+            count_expansions(task, lambda map_obj: manhattan),
+            count_expansions(task, landmark_heuristic)
+        ))
+
+    print(f"{'task':>4} {'manhattan':>10} {'landmarks':>10}")
+    for task, n_manhattan, n_landmarks in rows:
+        print(f"{task:>4} {n_manhattan:>10} {n_landmarks:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import heapq
+import time
+
+import numpy as np
+
+from grid_a_star import MOVES, grid_a_star, to_index, to_pos
+from Map import Map_Obj
+
+
+class LPAStar:
+    """
+    Lifelong Planning A* from a fixed start towards a goal which may move.
+
+    g and rhs values are kept between calls to plan(), so only the part of
+    the search affected by a goal move or a cell cost change is repaired.
+    The g values measure cost from the start and stay valid when the goal
+    moves; only the heuristic changes. Like the km term of D* Lite, every goal
+    move raises all future keys by the manhattan distance the goal moved,
+    which keeps the queued keys lower bounds without reordering the queue.
+
+    Moving into a cell costs the value of that cell, as in cost_func. Cell
+    changes made through the Map_Obj reach the planner through its cell
+    listeners, so plan() never has to look at the whole map.
+    """
+    def __init__(self, map_obj, start=None):
+        self.map_obj = map_obj
+        self.int_map = map_obj.int_map
+        self.height, self.width = self.int_map.shape
+        # A view of the map, so cell costs stay in step with it
+        self.costs = self.int_map.reshape(-1)
+
+        start = map_obj.get_start_pos() if start is None else start
+        self.start = to_index(start, self.width)
+        self.goal = to_index(map_obj.get_goal_pos(), self.width)
+        self.km = 0
+
+        n = self.height * self.width
+        self.g = np.full(n, np.inf)
+        self.rhs = np.full(n, np.inf)
+        self.rhs[self.start] = 0
+
+        # Lazily updated queue, keys maps from queued cell to its current key
+        self.open_ = []
+        self.keys = {}
+        self._queue(self.start)
+
+        self.expansions = 0
+        self._path = None
+        self._path_goal = None
+        map_obj.add_cell_listener(self._on_cell_changed)
+
+    # Public functions
+    def plan(self):
+        '''
+        Brings the search up to date with the goal position and cell costs of
+        the map, and returns the cheapest path from start to goal as a list of
+        (x, y) positions, or None if there is none.
+        '''
+        goal = to_index(self.map_obj.get_goal_pos(), self.width)
+        if goal != self.goal:
+            self.move_goal(goal)
+
+        self.expansions = 0
+        self._compute_shortest_path()
+
+        # Nothing changed since the last plan, so neither did the path
+        if self._path_goal != self.goal or self.expansions:
+            self._path = self.path()
+            self._path_goal = self.goal
+        return self._path
+
+    def move_goal(self, goal):
+        '''
+        Moves the goal to the given cell index.
+        '''
+        self.km += self._h(goal, self.goal)
+        self.goal = goal
+
+    def set_cell_value(self, pos, value):
+        '''
+        Changes the cost of moving into the given cell, on the map itself,
+        which lets the planner know through its cell listener.
+        '''
+        self.map_obj.set_cell_value(pos, value, str_map=False)
+
+    def close(self):
+        '''
+        Stops following cell changes of the map.
+        '''
+        if self._on_cell_changed in self.map_obj.cell_listeners:
+            self.map_obj.remove_cell_listener(self._on_cell_changed)
+
+    def path_cost(self):
+        '''
+        Cost of the cheapest path from start to the current goal.
+        '''
+        return self.g[self.goal]
+
+    def path(self):
+        '''
+        Walks back from the goal along the cheapest predecessors.
+        '''
+        if not np.isfinite(self.g[self.goal]):
+            return None
+
+        u = self.goal
+        path = [to_pos(u, self.width)]
+        while u != self.start:
+            # All predecessors pay the same cost to enter u
+            u = min(self._neighbours(u), key=lambda p: self.g[p])
+            path.append(to_pos(u, self.width))
+        path.reverse()
+        return path
+
+    # Private functions
+    def _on_cell_changed(self, pos, old_value, value):
+        self._update_vertex(to_index(pos, self.width))
+        self._path_goal = None
+
+    def _h(self, u, v):
+        (x0, y0), (x1, y1) = divmod(u, self.width), divmod(v, self.width)
+        return abs(x0 - x1) + abs(y0 - y1)
+
+    def _key(self, u):
+        k = min(self.g[u], self.rhs[u])
+        return (k + self._h(u, self.goal) + self.km, k)
+
+    def _queue(self, u):
+        key = self._key(u)
+        self.keys[u] = key
+        heapq.heappush(self.open_, (key, u))
+
+    def _top(self):
+        '''
+        Returns the (key, cell) pair with the lowest key, skipping stale entries.
+        '''
+        while self.open_:
+            key, u = self.open_[0]
+            if self.keys.get(u) == key:
+                return key, u
+            heapq.heappop(self.open_)
+        return (np.inf, np.inf), None
+
+    def _neighbours(self, u):
+        x, y = divmod(u, self.width)
+        for dx, dy in MOVES:
+            x_ = x + dx
+            y_ = y + dy
+            if (x_ < 0) or (x_ >= self.height) or (y_ < 0) or (y_ >= self.width):
+                continue
+            v = x_ * self.width + y_
+            if self.costs[v] != Map_Obj.OBSTACLE_CELL:
+                yield v
+
+    def _update_vertex(self, u):
+        if u != self.start:
+            if self.costs[u] == Map_Obj.OBSTACLE_CELL:
+                self.rhs[u] = np.inf
+            else:
+                best = min((self.g[p] for p in self._neighbours(u)), default=np.inf)
+                self.rhs[u] = best + self.costs[u]
+
+        if self.g[u] != self.rhs[u]:
+            self._queue(u)
+        else:
+            self.keys.pop(u, None)
+
+    def _compute_shortest_path(self):
+        while True:
+            key, u = self._top()
+            if not (key < self._key(self.goal) or self.rhs[self.goal] != self.g[self.goal]):
+                return
+            if u is None:
+                return
+
+            new_key = self._key(u)
+            if key < new_key:
+                # Key is outdated by goal moves, requeue with the current one
+                self._queue(u)
+                continue
+
+            heapq.heappop(self.open_)
+            del self.keys[u]
+            self.expansions += 1
+
+            if self.g[u] > self.rhs[u]:
+                self.g[u] = self.rhs[u]
+                for v in self._neighbours(u):
+                    self._update_vertex(v)
+            else:
+                self.g[u] = np.inf
+                self._update_vertex(u)
+                for v in self._neighbours(u):
+                    self._update_vertex(v)
+
+
+def main():
+    '''
+    Replans after every tick of task 5 until the goal stops moving, and
+    compares the work against planning from scratch with grid_a_star.
+    '''
+    map_obj = Map_Obj(task=5)
+    planner = LPAStar(map_obj)
+    planner.plan()
+    print(f"initial plan: {planner.expansions} expansions")
+
+    ticks = 0
+    incremental_time = fresh_time = 0
+    incremental_expansions = 0
+    while map_obj.get_goal_pos() != map_obj.get_end_goal_pos():
+        map_obj.tick()
+        ticks += 1
+
+        t = time.perf_counter()
+        planner.plan()
+        incremental_time += time.perf_counter() - t
+        incremental_expansions += planner.expansions
+
+        t = time.perf_counter()
+        grid_a_star(map_obj.int_map, map_obj.get_start_pos(), map_obj.get_goal_pos())
+        fresh_time += time.perf_counter() - t
+
+    print(f"{ticks} ticks: {incremental_expansions} incremental expansions")
+    print(f"incremental: {incremental_time * 1000:.2f} ms, from scratch: {fresh_time * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Least recently used cache of precomputed search data, such as distance
+    fields and compiled graphs. Values must have an nbytes attribute, and
+    are evicted once their total size exceeds max_bytes, although the most
+    recently used value is always kept.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+    def lookup(self, key, build):
+        '''
+        Returns the value stored under key, calling build() to create and
+        store it if there is none.
+        '''
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        value = build()
+        self.entries[key] = value
+        self.nbytes += value.nbytes
+        self._evict()
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, value = self.entries.popitem(last=False)
+            self.nbytes -= value.nbytes
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
@@ -129,3 +129,112 @@ class MinHeap(PriorityQueue):
     def decrease_key_noderef(self, node, key):
         return super().modify_key_noderef(node, key)
 
+
+
+class IndexedPriorityQueue(PriorityQueue):
+    """
+    Priority queue which keeps track of the slot occupied by every node.
+    Nodes must be hashable and unique within the queue, in exchange for
+    constant time membership tests and logarithmic time key updates.
+    """
+    def __init__(self, data=None, compare_keys=lambda k1, k2: k1 < k2, key_attr=None):
+        # Maps from node to its current index in self.data
+        self.index = {}
+        super().__init__(data=data, compare_keys=compare_keys, key_attr=key_attr)
+
+    # Public functions
+    def extract(self):
+        top_node = self.top()
+        last = self.size - 1
+        self._swap(0, last)
+        self.size -= 1
+        del self.data[-1]
+        del self.index[top_node]
+        self._heapify(0)
+        return top_node
+
+    def insert(self, node):
+        if node in self.index:
+            raise ValueError('The node is already in the queue.')
+        self.size += 1
+        self.data.append(node)
+        self.index[node] = self.size - 1
+        self._sift_up(self.size - 1)
+
+    def modify_key(self, i, key):
+        _key = self.node_to_key(self.data[i])
+        if self.compare_keys(_key, key):
+            raise ValueError(
+                'Key cannot be replaced with a key of lower priority.')
+
+        # Update key
+        if self.key_attr is None:
+            del self.index[self.data[i]]
+            self.data[i] = key
+            self.index[key] = i
+        else:
+            setattr(self.data[i], self.key_attr, key)
+
+        self._sift_up(i)
+
+    def modify_key_noderef(self, node, key):
+        self.modify_key(self.index[node], key)
+
+    # Private functions
+    def _build_heap(self):
+        self.index = {node: i for i, node in enumerate(self.data)}
+        if len(self.index) != self.size:
+            raise ValueError('Nodes of an indexed queue must be unique.')
+        super()._build_heap()
+
+    def _heapify(self, i):
+        # Iterative sift-down
+        while True:
+            l = PriorityQueue._left(i)
+            r = PriorityQueue._right(i)
+
+            # Identify node with the highest priority
+            if l < self.size and self.compare_nodes(self.data[l], self.data[i]):
+                prioritized = l
+            else:
+                prioritized = i
+            if r < self.size and self.compare_nodes(self.data[r], self.data[prioritized]):
+                prioritized = r
+            if prioritized == i:
+                return
+            self._swap(i, prioritized)
+            i = prioritized
+
+    def _sift_up(self, i):
+        while i > 0 and self.compare_nodes(self.data[i], self.data[PriorityQueue._parent(i)]):
+            self._swap(i, PriorityQueue._parent(i))
+            i = PriorityQueue._parent(i)
+
+    def _swap(self, i, j):
+        self.data[i], self.data[j] = self.data[j], self.data[i]
+        self.index[self.data[i]] = i
+        self.index[self.data[j]] = j
+
+    # Special methods
+    def __contains__(self, elem):
+        return elem in self.index
+
+
+class IndexedMinHeap(IndexedPriorityQueue):
+    def __init__(self, data=None, key_attr=None):
+        super().__init__(data=data, compare_keys=lambda k1, k2: k1 < k2, key_attr=key_attr)
+
+    def insert(self, node):
+        return super().insert(node)
+
+    def minimum(self):
+        return super().top()
+
+    def extract_min(self):
+        return super().extract()
+
+    def decrease_key(self, i, key):
+        return super().modify_key(i, key)
+
+    def decrease_key_noderef(self, node, key):
+        return super().modify_key_noderef(node, key)
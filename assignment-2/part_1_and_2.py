@@ -1,4 +1,7 @@
+import math
+
 from a_star import a_star
+from grid_a_star import move_table, neighbour_masks
 from Map import Map_Obj
 
 def euclidean(state):
@@ -19,6 +22,16 @@ def manhattan(state):
     goal = map_.get_goal_pos()
     return abs(goal[0] - pos[0]) + abs(goal[1] - pos[1])
 
+def octile(state):
+    '''
+    Heuristic function for 8-connected maps, given by the length of the
+    shortest path of straight and diagonal moves to the goal position.
+    '''
+    map_, *pos = state
+    goal = map_.get_goal_pos()
+    dx, dy = abs(goal[0] - pos[0]), abs(goal[1] - pos[1])
+    return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+
 def successors_gen(state):
     '''
     Generator function which yields all successors for a given state.
@@ -36,6 +49,23 @@ def successors_gen(state):
         if map_.get_cell_value((x + dx, y + dy)) != Map_Obj.OBSTACLE_CELL:
             yield (map_, x + dx, y + dy)
 
+def make_successors_gen(int_map, connectivity=8, corner_cutting='never'):
+    '''
+    Returns a generator function like successors_gen, for 4- or 8-connected
+    movement with the given corner cutting rule ('never', 'one_side' or
+    'always'). The valid moves of every cell are precomputed from int_map,
+    so each expansion is a single table lookup.
+    '''
+    masks = neighbour_masks(int_map, connectivity, corner_cutting).tolist()
+    moves = [tuple(step for _, step, _ in cell_moves) for cell_moves in move_table(int_map.shape[1])]
+
+    def grid_successors_gen(state):
+        map_, x, y = state
+        for dx, dy in moves[masks[x][y]]:
+            yield (map_, x + dx, y + dy)
+
+    return grid_successors_gen
+
 def goal_predicate(state):
     '''
     Checks if current position is a goal configuration.
@@ -51,17 +81,33 @@ def cost_func(from_state, to_state):
     map_, x, y = to_state
     return map_.get_cell_value((x, y))
 
-def main():
-    for task in range(1, 5): # runs through tasks 1 - 4, continues after key input
-        map_obj = Map_Obj(task=task)
+def diagonal_cost_func(from_state, to_state):
+    '''
+    Returns the cost of a state transition on an 8-connected map, where a
+    diagonal move costs sqrt(2) times the value of the target cell.
+    '''
+    _, x0, y0 = from_state
+    map_, x, y = to_state
+    cost = map_.get_cell_value((x, y))
+    return cost * math.sqrt(2) if x != x0 and y != y0 else cost
 
-        start_state = (map_obj, *map_obj.get_start_pos())
-        heuristic_func = manhattan
+def solve_task(task):
+    '''
+    Solves the given task and marks the path found on the string map.
+    '''
+    map_obj = Map_Obj(task=task)
+
+    start_state = (map_obj, *map_obj.get_start_pos())
+    heuristic_func = manhattan
 
-        output = a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=cost_func)
-        for coords in output:
-            map_obj.set_cell_value(coords, "☺", str_map = True)
+    output = a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=cost_func)
+    for coords in output:
+        map_obj.set_cell_value(coords, "☺", str_map = True)
+    return map_obj
 
+def main():
+    for task in range(1, 5): # runs through tasks 1 - 4, continues after key input
+        map_obj = solve_task(task)
         map_obj.show_map()
         input()
 
@@ -1,6 +1,10 @@
+import numpy as np
+
 from a_star import a_star
 from Map import Map_Obj
+from lpa_star import LPAStar
 from part_1_and_2 import successors_gen, cost_func
+from time_expanded import time_expanded_chase
 
 
 INSAYN_SPEED = False # whether our drunk friend is moving at half our speed (true) o a quarter of our speed (false)
@@ -19,6 +23,15 @@ def samf_chase_heuristic(state):
     new_goal = goal[0] - dx, goal[1] # update goal estimate
     return abs(new_goal[0] - pos[0]) + abs(new_goal[1] - pos[1])
 
+def samf_chase_array(int_map, goal):
+    '''
+    samf_chase_heuristic for every cell of the map at once, for use with HeuristicTable.
+    '''
+    xs, ys = np.indices(int_map.shape)
+    h_0 = np.abs(goal[0] - xs) + np.abs(goal[1] - ys)
+    new_goal_x = goal[0] - h_0 / 4
+    return np.abs(new_goal_x - xs) + np.abs(goal[1] - ys)
+
 
 def goal_predicate(state):
     '''
@@ -34,16 +47,61 @@ def goal_predicate(state):
 
     return tuple(map_.get_goal_pos()) == (x, y)
 
-def main():
+def incremental_chase(map_obj):
+    '''
+    Replans towards the moving goal after every step we take, reusing the
+    search effort of earlier steps. Entering a cell takes as many steps as its
+    cost, so the chase ends once the current goal position can be reached in
+    the number of steps taken so far.
+    '''
+    planner = LPAStar(map_obj)
+    steps = 0
+    while True:
+        path = planner.plan()
+        if path is not None and planner.path_cost() <= steps:
+            return path
+        if path is None and map_obj.get_goal_pos() == map_obj.get_end_goal_pos():
+            return None
+
+        map_obj.tick()
+        ##################################################
+        if (INSAYN_SPEED):
+            map_obj.tick()
+        ##################################################
+        steps += 1
+
+def solve(mode='a_star'):
+    '''
+    Chases the moving goal of task 5 and marks the path found on the string map.
+    mode is one of
+        'a_star':           ticks the goal on every goal test of a_star
+        'incremental':      replans with LPA* after every step
+        'time_expanded':    searches over (cell, time) against the precomputed
+                            goal trajectory, which gives the earliest interception
+    '''
     map_obj = Map_Obj(task=5)
 
-    start_state = (map_obj, *map_obj.get_start_pos())
-    heuristic_func = samf_chase_heuristic
+    if mode == 'a_star':
+        start_state = (map_obj, *map_obj.get_start_pos())
+        heuristic_func = samf_chase_heuristic
+        output = a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=cost_func)
+    elif mode == 'incremental':
+        output = incremental_chase(map_obj)
+    elif mode == 'time_expanded':
+        ticks_per_step = 2 if INSAYN_SPEED else 1
+        output, steps = time_expanded_chase(map_obj, ticks_per_step)
+        # Show the goal where it is caught
+        for _ in range(steps * ticks_per_step):
+            map_obj.tick()
+    else:
+        raise ValueError(f"Unknown chase mode '{mode}'.")
 
-    output = a_star(start_state, heuristic_func, successors_gen, goal_predicate, cost_func=cost_func)
     for coords in output:
         map_obj.set_cell_value(coords, "☺", str_map = True)
+    return map_obj
 
+def main():
+    map_obj = solve()
     map_obj.show_map()
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+import time
+
+
+class SearchStats:
+    """
+    Counters and timers for a single a_star search, enabled by passing an
+    instance as its stats argument.
+
+    Instrumentation works by wrapping the heuristic, successor generator,
+    goal predicate and frontier before the search starts, so a search run
+    without stats executes exactly the same code as before.
+    """
+    def __init__(self):
+        self.expansions = 0
+        self.generated = 0
+        self.reopened = 0
+        self.propagated = 0
+        self.frontier_peak = 0
+        self.heuristic_calls = 0
+        self.queue_ops = 0
+        self.heuristic_time = 0.0
+        self.successor_time = 0.0
+        self.queue_time = 0.0
+
+    def instrument(self, heuristic_func, successors_gen, goal_predicate, queue_factory):
+        '''
+        Returns counting and timing versions of the given search callables.
+        '''
+        def timed_heuristic(state):
+            t = time.perf_counter()
+            h = heuristic_func(state)
+            self.heuristic_time += time.perf_counter() - t
+            self.heuristic_calls += 1
+            return h
+
+        def timed_successors(state):
+            t = time.perf_counter()
+            states = list(successors_gen(state))
+            self.successor_time += time.perf_counter() - t
+            self.generated += len(states)
+            return iter(states)
+
+        def counting_goal_predicate(state):
+            self.expansions += 1
+            return goal_predicate(state)
+
+        def timed_queue_factory(**kwargs):
+            return TimedQueue(queue_factory(**kwargs), self)
+
+        return timed_heuristic, timed_successors, counting_goal_predicate, timed_queue_factory
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        return '\n'.join(
+            f"{name:>15}: {value:.6f}" if isinstance(value, float) else f"{name:>15}: {value}"
+            for name, value in vars(self).items()
+        )
+
+
+class TimedQueue:
+    """
+    Frontier wrapper which counts and times every operation on the wrapped
+    queue, and keeps track of its peak size.
+    """
+    def __init__(self, queue, stats):
+        self.queue = queue
+        self.stats = stats
+
+    def insert(self, node):
+        t = time.perf_counter()
+        self.queue.insert(node)
+        self._record(t)
+        self.stats.frontier_peak = max(self.stats.frontier_peak, len(self.queue))
+
+    def extract_min(self):
+        t = time.perf_counter()
+        node = self.queue.extract_min()
+        self._record(t)
+        return node
+
+    def decrease_key_noderef(self, node, key):
+        t = time.perf_counter()
+        self.queue.decrease_key_noderef(node, key)
+        self._record(t)
+
+    def _record(self, t):
+        self.stats.queue_time += time.perf_counter() - t
+        self.stats.queue_ops += 1
+
+    def __contains__(self, elem):
+        t = time.perf_counter()
+        found = elem in self.queue
+        self.stats.queue_time += time.perf_counter() - t
+        return found
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class MeetingStats:
+    """
+    Counters of a bidirectional search, filled in when an instance is passed
+    as the stats argument of bidirectional_a_star or grid_bidirectional_a_star.
+    """
+    def __init__(self):
+        self.forward_expansions = 0
+        self.backward_expansions = 0
+        self.meeting_updates = 0
+        self.meeting_point = None
+        self.cost = None
+
+    @property
+    def expansions(self):
+        return self.forward_expansions + self.backward_expansions
+
+    def as_dict(self):
+        return dict(vars(self), expansions=self.expansions)
+
+    def __str__(self):
+        return '\n'.join(f"{name:>19}: {value}" for name, value in self.as_dict().items())
+
+
+class ParallelStats:
+    """
+    Counters of a hash distributed search, filled in when an instance is
+    passed as the stats argument of hda_star.
+    """
+    def __init__(self):
+        self.worker_expansions = []
+        self.messages = 0
+        self.batches = 0
+        self.termination_checks = 0
+        self.cost = None
+
+    @property
+    def expansions(self):
+        return sum(self.worker_expansions)
+
+    @property
+    def load_balance(self):
+        '''
+        Mean over maximum expansions per worker, 1.0 when perfectly balanced.
+        '''
+        if not self.worker_expansions or max(self.worker_expansions) == 0:
+            return 1.0
+        return self.expansions / len(self.worker_expansions) / max(self.worker_expansions)
+
+    def as_dict(self):
+        return dict(vars(self), expansions=self.expansions, load_balance=self.load_balance)
+
+    def __str__(self):
+        return '\n'.join(f"{name:>19}: {value}" for name, value in self.as_dict().items())
@@ -0,0 +1,235 @@
+import bisect
+import copy
+import heapq
+
+import numpy as np
+
+from grid_a_star import move_table, neighbour_masks, path_cost, reconstruct_path, to_index
+from Map import Map_Obj
+
+
+def goal_trajectory(map_obj, ticks_per_step=1):
+    '''
+    Precomputes where the moving goal of the given Map_Obj will be, by
+    replaying its tick() on a copy. Row t of the returned (T + 1, 2) array is
+    the goal position after t of our steps, each step advancing the goal by
+    ticks_per_step ticks. The last row is the end goal, where it stays.
+    '''
+    # Leave out listeners, so the replay does not update their data
+    map_copy = copy.deepcopy(map_obj, {id(map_obj.goal_listeners): [], id(map_obj.cell_listeners): []})
+    trajectory = [tuple(map_copy.get_goal_pos())]
+    end_goal = map_copy.get_end_goal_pos()
+    while end_goal is not None and trajectory[-1] != tuple(end_goal):
+        for _ in range(ticks_per_step):
+            map_copy.tick()
+        trajectory.append(tuple(map_copy.get_goal_pos()))
+    return np.array(trajectory, dtype=np.int64)
+
+def intercept(int_map, start, trajectory, ticks_per_step=None):
+    """
+    Finds the earliest time and route to catch a goal moving along a known
+    trajectory, searching over (cell, time) states.
+
+    Entering a cell takes as many steps as its cost, and we may wait in a
+    cell. A state is therefore dominated by an earlier arrival at the same
+    cell, so only the earliest arrival per cell is expanded, and the goal is
+    caught in a cell at its first visit there after we arrive.
+    The result only depends on the map and the trajectory, never on the
+    order of expansions.
+
+    Input:
+        int_map:            2D array of cell costs, Map_Obj.OBSTACLE_CELL marks walls
+        start:              Start position (x, y)
+        trajectory:         (T + 1, 2) array of goal positions per step, as
+                            returned by goal_trajectory, staying at the last one
+
+        (Optional)
+        ticks_per_step:     Goal ticks per step, for goals moving once every 4
+                            ticks as in Map_Obj.tick(). Used to bound the
+                            time left, which is not bounded if it is None.
+
+    Returns:
+        A tuple (path, time), where path is of the form
+            [(x0, y0), (x1, y1), ..., (xn, yn)]
+        leading to the cell where the goal is caught at the given time, or
+        (None, None) if the goal can not be caught.
+    """
+    height, width = int_map.shape
+    n = height * width
+    costs = memoryview(np.ascontiguousarray(int_map.ravel()))
+    masks = neighbour_masks(int_map).ravel().tolist()
+    moves = move_table(width)
+
+    # Steps at which the goal is in each cell it passes through. It stays in
+    # the last cell from the last step on.
+    visits = {}
+    for t, (x, y) in enumerate(trajectory.tolist()):
+        visits.setdefault(to_index((x, y), width), []).append(t)
+    last = len(trajectory) - 1
+    final_cell = to_index(trajectory[last], width)
+
+    def catch_time(u, t):
+        if u == final_cell and t >= last:
+            return t
+        times = visits.get(u, ())
+        i = bisect.bisect_left(times, t)
+        return times[i] if i < len(times) else None
+
+    # Lower bound on the steps left: every step closes the distance by at
+    # most one cell of our own and, on average, ticks_per_step / 4 goal moves
+    if ticks_per_step is None:
+        time_to_go = lambda u, t: 0
+    else:
+        closing_speed = 1 + ticks_per_step / 4
+        def time_to_go(u, t):
+            gx, gy = trajectory[min(t, last)]
+            x, y = divmod(u, width)
+            return max(0, (abs(gx - x) + abs(gy - y) - 1) / closing_speed)
+
+    # Earliest arrival time per cell, the only non-dominated state of a cell
+    arrival = memoryview(np.full(n, np.iinfo(np.int64).max, dtype=np.int64))
+    parent_array = np.full(n, -1, dtype=np.int64)
+    parent = memoryview(parent_array)
+    closed = memoryview(np.zeros(n, dtype=bool))
+
+    s = to_index(start, width)
+    arrival[s] = 0
+    open_ = [(time_to_go(s, 0), 0, s)]
+    best_time, best_cell = None, -1
+
+    while open_:
+        key, t, u = heapq.heappop(open_)
+        if best_time is not None and key >= best_time:
+            break
+        if closed[u] or t > arrival[u]:
+            continue
+        closed[u] = True
+
+        # Wait here for the goal, if it is yet to pass this cell
+        caught = catch_time(u, t)
+        if caught is not None and (best_time is None or caught < best_time):
+            best_time, best_cell = caught, u
+
+        for offset, _, _ in moves[masks[u]]:
+            v = u + offset
+            t_v = t + costs[v]
+            if not closed[v] and t_v < arrival[v]:
+                arrival[v] = t_v
+                parent[v] = u
+                heapq.heappush(open_, (t_v + time_to_go(v, t_v), t_v, v))
+
+    if best_time is None:
+        return None, None
+    return reconstruct_path(parent_array, best_cell, width), int(best_time)
+
+def time_expanded_chase(map_obj, ticks_per_step=1):
+    '''
+    Intercepts the moving goal of the given Map_Obj, returning (path, time).
+    '''
+    trajectory = goal_trajectory(map_obj, ticks_per_step)
+    return intercept(map_obj.int_map, map_obj.get_start_pos(), trajectory, ticks_per_step)
+
+def brute_force_catch_time(int_map, start, trajectory):
+    '''
+    Earliest step at which the goal can be caught, found without the
+    domination argument of intercept: step by step, it tracks every cell we
+    can be in at that step, having waited anywhere along the way.
+    Returns None if the goal can not be caught.
+    '''
+    free = int_map != Map_Obj.OBSTACLE_CELL
+    last = len(trajectory) - 1
+    # Once the goal rests, any cell reachable at all is reachable by then
+    horizon = last + int(int_map[free].sum()) + 1
+
+    reachable = [np.zeros(int_map.shape, dtype=bool)]
+    reachable[0][tuple(start)] = True
+    for t in range(horizon + 1):
+        if t > 0:
+            now = reachable[t - 1].copy()
+            for cost in np.unique(int_map[free]):
+                if cost > t:
+                    continue
+                before = np.pad(reachable[t - cost], 1)
+                neighbours = before[:-2, 1:-1] | before[2:, 1:-1] | before[1:-1, :-2] | before[1:-1, 2:]
+                now |= neighbours & (int_map == cost)
+            reachable.append(now)
+        if reachable[t][tuple(trajectory[min(t, last)])]:
+            return t
+    return None
+
+def check_against_brute_force(n_cases, size=10, seed=0):
+    '''
+    Compares intercept to brute_force_catch_time on random weighted maps,
+    with the goal on a random walk which may stand still. Also checks that
+    the returned path is a valid route to the goal's cell at the catch time.
+    Raises RuntimeError on the first mismatch, returns the number of cases.
+    '''
+    # Imported here, so the search itself does not load the whole benchmark
+    from benchmark import make_map
+
+    rng = np.random.default_rng(seed)
+    for case in range(n_cases):
+        int_map, start, _ = make_map('random', size, 0.25, True, seed + case)
+        free_cells = np.argwhere(int_map != Map_Obj.OBSTACLE_CELL)
+        walk = [tuple(free_cells[rng.integers(len(free_cells))])]
+        for _ in range(rng.integers(1, 40)):
+            x, y = walk[-1]
+            dx, dy = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))[rng.integers(5)]
+            if 0 <= x + dx < size and 0 <= y + dy < size and int_map[x + dx, y + dy] != Map_Obj.OBSTACLE_CELL:
+                x, y = x + dx, y + dy
+            walk.append((x, y))
+        trajectory = np.array(walk, dtype=np.int64)
+
+        expected = brute_force_catch_time(int_map, start, trajectory)
+        path, time = intercept(int_map, start, trajectory)
+        valid = time == expected
+        if valid and path is not None:
+            steps = np.abs(np.diff(np.array(path), axis=0)).sum(axis=1)
+            valid = (
+                tuple(path[0]) == tuple(start) and (steps == 1).all()
+                and path_cost(int_map, path) <= time
+                and tuple(path[-1]) == tuple(trajectory[min(time, len(trajectory) - 1)])
+            )
+        if not valid:
+            raise RuntimeError(f"intercept caught the goal at {time} instead of {expected} "
+                               f"in case {case} (seed {seed + case}).")
+    return n_cases
+
+def main():
+    # Imported here, since part_3 builds on this module
+    import contextlib
+    import io
+    import part_3
+    from a_star import a_star
+    from part_1_and_2 import successors_gen, cost_func
+
+    print(f"{'speed':>5} {'mode':>14} {'arrival':>8} {'caught':>7}")
+    for faster in (False, True):
+        part_3.INSAYN_SPEED = faster
+        ticks_per_step = 2 if faster else 1
+        trajectory = goal_trajectory(Map_Obj(task=5), ticks_per_step).tolist()
+
+        map_obj = Map_Obj(task=5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            paths = {
+                'a_star': a_star((map_obj, *map_obj.get_start_pos()), part_3.samf_chase_heuristic,
+                                 successors_gen, part_3.goal_predicate, cost_func=cost_func),
+                'incremental': part_3.incremental_chase(Map_Obj(task=5)),
+                'time_expanded': time_expanded_chase(Map_Obj(task=5), ticks_per_step)[0],
+            }
+
+        for mode, path in paths.items():
+            # Step at which the goal actually passes the end of the path, if at all
+            arrival = path_cost(map_obj.int_map, path)
+            end = list(path[-1])
+            passes = [t for t, pos in enumerate(trajectory) if pos == end and t >= arrival]
+            if not passes and end == trajectory[-1]:
+                passes = [arrival]
+            caught = passes[0] if passes else 'missed'
+            print(f"{'1/2' if faster else '1/4':>5} {mode:>14} {arrival:>8} {caught:>7}")
+
+    n_cases = check_against_brute_force(300)
+    print(f"{n_cases} random maps and trajectories match the brute force catch time")
+
+if __name__ == "__main__":
+    main()